@@ -0,0 +1,11 @@
+CREATE TABLE kv_store (
+    namespace VARCHAR(255) NOT NULL,
+    key VARCHAR(255) NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (namespace, key)
+) WITHOUT ROWID;
+
+INSERT INTO kv_store (namespace, key, value)
+SELECT 'module:' || substr(name, 1, length(name) - 9), 'disabled', 'true'
+FROM settings
+WHERE name LIKE '%\_disabled' ESCAPE '\' AND value IN ('1', 'True', 'true');
@@ -0,0 +1,39 @@
+CREATE TABLE module_accounts (
+    module VARCHAR(255) NOT NULL,
+    session_name VARCHAR(255) NOT NULL,
+    position INTEGER NOT NULL,
+    disabled INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL,
+    PRIMARY KEY (module, session_name)
+) WITHOUT ROWID;
+
+CREATE TABLE module_sessions (
+    module VARCHAR(255) NOT NULL,
+    session_name VARCHAR(255) NOT NULL,
+    disabled INTEGER NOT NULL DEFAULT 1,
+    PRIMARY KEY (module, session_name)
+) WITHOUT ROWID;
+
+CREATE TABLE module_tokens (
+    module VARCHAR(255) NOT NULL,
+    session_name VARCHAR(255) NOT NULL,
+    token TEXT NOT NULL,
+    PRIMARY KEY (module, session_name)
+) WITHOUT ROWID;
+
+CREATE TABLE module_settings (
+    module VARCHAR(255) NOT NULL,
+    key VARCHAR(255) NOT NULL,
+    position INTEGER NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (module, key)
+) WITHOUT ROWID;
+
+CREATE TABLE display_metrics (
+    module VARCHAR(255) NOT NULL,
+    category VARCHAR(255) NOT NULL,
+    key VARCHAR(255) NOT NULL,
+    position INTEGER NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (module, category, key)
+) WITHOUT ROWID;
@@ -14,6 +14,7 @@ import json
 
 import mcf_utils.logColors as lc
 from mcf_utils.database import Database
+from mcf_utils.module_storage import ModuleStorage
 from mcf_utils.modules import Module
 from mcf_utils.webserver import WebServer
 import mcf_utils.variables as var
@@ -140,6 +141,7 @@ async def start_bot():
     modules = Module(log)
     modules.load_modules()
     db.migration_modules(modules.module_list)
+    ModuleStorage("database.db", log).import_modules(modules.module_list)
 
     modulesThread = Module_Thread(log)
 
@@ -212,6 +214,8 @@ async def start_bot():
         )
         threading.Thread(target=modulesThread.update_check_thread).start()
 
+    threading.Thread(target=modulesThread.telemetry_thread, daemon=True).start()
+    threading.Thread(target=modulesThread.storage_sync_thread, daemon=True).start()
     modulesThread.run_all_modules()
 
     while True:
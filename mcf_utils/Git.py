@@ -46,6 +46,40 @@ class Git:
         self._log_git_error()
         return None
 
+    def ReadLocalCommit(self, directory=None):
+        # Resolve HEAD from the .git directory without spawning git.
+        directory = directory or os.getcwd()
+        git_dir = os.path.join(directory, ".git")
+        try:
+            with open(os.path.join(git_dir, "HEAD"), "r") as f:
+                head = f.read().strip()
+
+            if head.startswith("ref: "):
+                ref = head[5:]
+                ref_file = os.path.join(git_dir, ref)
+                if os.path.exists(ref_file):
+                    with open(ref_file, "r") as f:
+                        head = f.read().strip()
+                else:
+                    head = None
+                    with open(os.path.join(git_dir, "packed-refs"), "r") as f:
+                        for line in f:
+                            parts = line.strip().split(" ")
+                            if len(parts) == 2 and parts[1] == ref:
+                                head = parts[0]
+                                break
+
+            if head and len(head) == 40:
+                return head
+        except Exception as e:
+            pass
+
+        return self.GetRecentLocalCommit(directory)
+
+    def FetchProject(self, directory=None):
+        directory = directory or os.getcwd()
+        return self._run_git_command("git fetch --quiet", directory) is not None
+
     def GitHasCommit(self, commit_hash, directory=None):
         directory = directory or os.getcwd()
         response = self._run_git_command(f"git cat-file -t {commit_hash}", directory)
@@ -3,46 +3,461 @@
 # Github: https://github.com/masterking32
 # Telegram: https://t.me/MasterCryptoFarmBot
 
+import asyncio
+import copy
+import hashlib
+import os
+import random
+import tempfile
+import threading
+import time
+from urllib.parse import urlparse
+
+import aiohttp
 import requests
 import json
+from requests.adapters import HTTPAdapter
+
+import mcf_utils.module_shutdown as module_shutdown
+
+CONNECT_TIMEOUT = 5
+READ_TIMEOUT = 20
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8
+POOL_SIZE = 10
+RETRY_STATUS_CODES = [429, 500, 502, 503, 504]
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_COOLDOWN = 60
+
+# Seconds an answer is fresh, per API action.
+CACHE_TTLS = {
+    "get_license": 300,
+    "get_modules": 300,
+    "get_user_modules": 300,
+    "get_mcf_version": 600,
+}
+# An expired answer is still served this long while it is refreshed.
+CACHE_STALE_TTL = 3600
+CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".api_cache"
+)
+
+session_lock = threading.Lock()
+session = None
+session_pid = None
+async_sessions = {}
+
+
+def get_session():
+    # One keep-alive pool per process, a forked module must not share sockets.
+    global session, session_pid
+    with session_lock:
+        if session is None or session_pid != os.getpid():
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session_pid = os.getpid()
+        return session
+
+
+class ResponseCache:
+    # Memory first, then a file per key so module processes share answers.
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir
+        self.lock = threading.Lock()
+        self.entries = {}
+        self.inflight = {}
+        self.async_inflight = {}
+
+    def get(self, key, ttl, fetch, is_valid, on_fallback=None):
+        entry = self._get_entry(key, ttl)
+        if entry is not None:
+            age = time.time() - entry[0]
+            if age < ttl:
+                return copy.deepcopy(entry[1])
+            if age < ttl + CACHE_STALE_TTL:
+                # Stale while revalidate, the caller does not wait.
+                self._fetch(key, fetch, is_valid, wait=False)
+                return copy.deepcopy(entry[1])
+
+        value = self._fetch(key, fetch, is_valid, wait=True)
+        return copy.deepcopy(self._get_fallback(value, entry, on_fallback))
+
+    async def get_async(self, key, ttl, fetch, is_valid, on_fallback=None):
+        entry = self._get_entry(key, ttl)
+        if entry is not None:
+            age = time.time() - entry[0]
+            if age < ttl:
+                return copy.deepcopy(entry[1])
+            if age < ttl + CACHE_STALE_TTL:
+                self._fetch_async(key, fetch, is_valid)
+                return copy.deepcopy(entry[1])
+
+        # shield(), a cancelled caller must not cancel the shared request.
+        task = self._fetch_async(key, fetch, is_valid)
+        value = await asyncio.shield(task)
+        return copy.deepcopy(self._get_fallback(value, entry, on_fallback))
+
+    def _get_fallback(self, value, entry, on_fallback):
+        # No answer at all means the API is down, keep using the last good one.
+        if value is not None or entry is None:
+            return value
+
+        if on_fallback is not None:
+            on_fallback(time.time() - entry[0])
+        return entry[1]
+
+    def clear(self):
+        with self.lock:
+            self.entries = {}
+
+        if self.cache_dir is None or not os.path.isdir(self.cache_dir):
+            return
+        for file_name in os.listdir(self.cache_dir):
+            try:
+                os.unlink(os.path.join(self.cache_dir, file_name))
+            except OSError:
+                pass
+
+    def _fetch(self, key, fetch, is_valid, wait):
+        # Single flight, concurrent callers for the same key share one request.
+        with self.lock:
+            inflight = self.inflight.get(key)
+            leader = inflight is None
+            if leader:
+                inflight = {"event": threading.Event(), "value": None}
+                self.inflight[key] = inflight
+
+        if leader and wait:
+            self._run_fetch(key, fetch, is_valid, inflight)
+        elif leader:
+            threading.Thread(
+                target=self._run_fetch,
+                args=(key, fetch, is_valid, inflight),
+                daemon=True,
+            ).start()
+            return None
+        elif not wait:
+            return None
+        else:
+            inflight["event"].wait()
+        return inflight["value"]
+
+    def _fetch_async(self, key, fetch, is_valid):
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            task = self.async_inflight.get((loop, key))
+            if task is None:
+                task = loop.create_task(self._run_fetch_async(key, fetch, is_valid))
+                self.async_inflight[(loop, key)] = task
+                task.add_done_callback(
+                    lambda _: self.async_inflight.pop((loop, key), None)
+                )
+        return task
+
+    async def _run_fetch_async(self, key, fetch, is_valid):
+        try:
+            value = await fetch()
+        except Exception as e:
+            return None
+
+        self._store(key, value, is_valid)
+        return value
+
+    def _run_fetch(self, key, fetch, is_valid, inflight):
+        value = None
+        try:
+            value = fetch()
+            self._store(key, value, is_valid)
+        finally:
+            inflight["value"] = value
+            with self.lock:
+                self.inflight.pop(key, None)
+            inflight["event"].set()
+
+    def _store(self, key, value, is_valid):
+        if value is None:
+            # No answer, the last good entry stays as the fallback.
+            return
+        if is_valid(value):
+            self._set_entry(key, value)
+        else:
+            # A real negative answer (e.g. a revoked license) replaces it.
+            self._delete_entry(key)
+
+    def _get_entry(self, key, ttl):
+        with self.lock:
+            entry = self.entries.get(key)
+
+        if entry is not None and time.time() - entry[0] < ttl:
+            return entry
+
+        # Another process may have refreshed it already.
+        disk_entry = self._read_file(key)
+        if disk_entry is not None and (entry is None or disk_entry[0] > entry[0]):
+            with self.lock:
+                self.entries[key] = disk_entry
+            return disk_entry
+        return entry
+
+    def _set_entry(self, key, value):
+        entry = (time.time(), value)
+        with self.lock:
+            self.entries[key] = entry
+        self._write_file(key, entry)
+
+    def _delete_entry(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+        if self.cache_dir is None:
+            return
+        try:
+            os.unlink(self._get_path(key))
+        except OSError:
+            pass
+
+    def _get_path(self, key):
+        return os.path.join(
+            self.cache_dir, hashlib.sha256(key.encode()).hexdigest() + ".json"
+        )
+
+    def _read_file(self, key):
+        if self.cache_dir is None:
+            return None
+
+        try:
+            with open(self._get_path(key), "r") as f:
+                data = json.load(f)
+            return (data["time"], data["value"])
+        except Exception as e:
+            return None
+
+    def _write_file(self, key, entry):
+        if self.cache_dir is None:
+            return
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Answers contain the license, mkstemp keeps the file private.
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    json.dump({"time": entry[0], "value": entry[1]}, f)
+                os.replace(tmp_path, self._get_path(key))
+            except Exception:
+                os.unlink(tmp_path)
+                raise
+        except Exception as e:
+            pass
+
+
+response_cache = ResponseCache(CACHE_DIR)
+
+
+class CircuitBreaker:
+    # Closed until failure_threshold failures in a row, then open (fail fast)
+    # for cooldown seconds, then one request is let through as a probe.
+    def __init__(
+        self, failure_threshold=BREAKER_FAILURE_THRESHOLD, cooldown=BREAKER_COOLDOWN
+    ):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        self.failures = 0
+        self.opened_time = None
+        self.probing = False
+        self.probe_time = None
+
+    def allow_request(self):
+        with self.lock:
+            if self.opened_time is None:
+                return True
+            # A probe that never reported back is given up after a cooldown.
+            if self.probing and time.time() - self.probe_time < self.cooldown:
+                return False
+            if time.time() - self.opened_time < self.cooldown:
+                return False
+            self.probing = True
+            self.probe_time = time.time()
+            return True
+
+    def record_success(self):
+        with self.lock:
+            was_open = self.opened_time is not None
+            self.failures = 0
+            self.opened_time = None
+            self.probing = False
+        return was_open
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            was_probing = self.probing
+            self.probing = False
+            if was_probing or (
+                self.opened_time is None and self.failures >= self.failure_threshold
+            ):
+                opened = self.opened_time is None
+                self.opened_time = time.time()
+                return opened
+        return False
+
+    def is_open(self):
+        with self.lock:
+            return self.opened_time is not None
+
+
+breakers = {}
+
+
+def get_breaker(url):
+    host = urlparse(url).netloc
+    with session_lock:
+        if host not in breakers:
+            breakers[host] = CircuitBreaker()
+        return breakers[host]
+
+
+def record_success(logger, breaker, url):
+    if breaker.record_success():
+        logger.info(
+            f"<green>✅ <cyan>{urlparse(url).netloc}</cyan> is reachable again.</green>"
+        )
+
+
+def record_failure(logger, breaker, url):
+    if breaker.record_failure():
+        logger.warning(
+            f"<yellow>⚠️ <cyan>{urlparse(url).netloc}</cyan> is not responding, pausing requests for <cyan>{breaker.cooldown}</cyan> seconds ...</yellow>"
+        )
+
+
+def log_cache_fallback(logger, age):
+    logger.warning(
+        f"<yellow>⚠️ MCF API is unavailable, using the answer from <cyan>{int(age)}</cyan> seconds ago.</yellow>"
+    )
+
+
+def get_async_session():
+    # aiohttp sessions belong to one event loop, modules run a loop per thread.
+    loop = asyncio.get_running_loop()
+    with session_lock:
+        async_session = async_sessions.get(loop)
+        if async_session is None or async_session.closed:
+            async_session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=POOL_SIZE),
+                timeout=aiohttp.ClientTimeout(
+                    sock_connect=CONNECT_TIMEOUT, sock_read=READ_TIMEOUT
+                ),
+            )
+            async_sessions[loop] = async_session
+        return async_session
+
+
+async def close_async_session():
+    with session_lock:
+        async_session = async_sessions.pop(asyncio.get_running_loop(), None)
+    if async_session is not None:
+        await async_session.close()
+
+
+module_shutdown.add_loop_cleanup(close_async_session)
+
+
+def parse_post_response(status_code, text):
+    try:
+        if status_code == 200:
+            return json.loads(text)
+        elif status_code == 403:
+            return {"error": "License is not valid, please check your license"}
+        elif "error" in text:
+            return json.loads(text)
+        else:
+            return {"error": "API Error: Please try again later"}
+    except Exception as e:
+        return None
+
+
+def is_success(response):
+    return isinstance(response, dict) and response.get("status") == "success"
+
+
+def get_backoff(attempt):
+    # Full jitter, clients that failed together do not retry together.
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2**attempt)))
 
 
 class API:
     def __init__(self, logger):
         self.logger = logger
+        self.timeout = (CONNECT_TIMEOUT, READ_TIMEOUT)
+
+    def _request(self, method, url, retries=5, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        breaker = get_breaker(url)
+        response = None
+        for attempt in range(retries):
+            if not breaker.allow_request():
+                return response
+            if attempt > 0:
+                time.sleep(get_backoff(attempt - 1))
 
-    def _post_request(self, url, data, retries=5):
-        for _ in range(retries):
             try:
-                response = requests.post(url, data=data)
-                if response.status_code == 200:
-                    return response.json()
-                elif response.status_code == 403:
-                    return {"error": "License is not valid, please check your license"}
-                elif "error" in response.text:
-                    return response.json()
-                else:
-                    return {"error": "API Error: Please try again later"}
-            except Exception as e:
-                # self.logger.error(f"API Error: {e}")
-                pass
-        return None
+                response = get_session().request(method, url, **kwargs)
+            except requests.RequestException as e:
+                response = None
+                record_failure(self.logger, breaker, url)
+                continue
+            except BaseException:
+                # Release a half-open probe before the error goes up.
+                record_failure(self.logger, breaker, url)
+                raise
+
+            if response.status_code not in RETRY_STATUS_CODES:
+                record_success(self.logger, breaker, url)
+                return response
+            record_failure(self.logger, breaker, url)
+        return response
+
+    def _on_cache_fallback(self, age):
+        log_cache_fallback(self.logger, age)
+
+    def _cached_post_request(self, url, data, is_valid):
+        ttl = CACHE_TTLS.get(data.get("action"))
+        if ttl is None:
+            return self._post_request(url, data)
+
+        key = url + "?" + json.dumps(data, sort_keys=True)
+        return response_cache.get(
+            key,
+            ttl,
+            lambda: self._post_request(url, data),
+            is_valid,
+            self._on_cache_fallback,
+        )
+
+    def _post_request(self, url, data, retries=5):
+        response = self._request("POST", url, retries, data=data)
+        if response is None or response.status_code in RETRY_STATUS_CODES:
+            return None
+        return parse_post_response(response.status_code, response.text)
 
     def __get_request(self, url, retries=5):
-        for _ in range(retries):
-            try:
-                response = requests.get(url)
-                if response.status_code == 200:
-                    return response.json()
-            except Exception as e:
-                # self.logger.error(f"API Error: {e}")
-                pass
+        response = self._request("GET", url, retries)
+        try:
+            if response is not None and response.status_code == 200:
+                return response.json()
+        except Exception as e:
+            # self.logger.error(f"API Error: {e}")
+            pass
         return None
 
     def validate_license(self, license):
         data = {"license_key": license, "action": "get_license"}
-        response = self._post_request(
-            "https://api.masterking32.com/mcf_bot/api.php", data
+        response = self._cached_post_request(
+            "https://api.masterking32.com/mcf_bot/api.php", data, is_success
         )
         if response and response.get("status") == "success":
             return response
@@ -50,8 +465,8 @@ class API:
 
     def get_modules(self, license):
         data = {"license_key": license, "action": "get_modules"}
-        response = self._post_request(
-            "https://api.masterking32.com/mcf_bot/api.php", data
+        response = self._cached_post_request(
+            "https://api.masterking32.com/mcf_bot/api.php", data, is_success
         )
         if response:
             if response.get("status") == "success":
@@ -74,6 +489,8 @@ class API:
         )
         if response:
             if response.get("status") == "success":
+                # The module list of the license changed.
+                response_cache.clear()
                 return response
             return {
                 "error": response.get(
@@ -83,9 +500,10 @@ class API:
         return {"error": "Unable to install module, please try again later"}
 
     def get_mcf_version(self):
-        response = self._post_request(
+        response = self._cached_post_request(
             "https://api.masterking32.com/mcf_bot/mcf_version.php",
-            data={"action": "get_mcf_version"},
+            {"action": "get_mcf_version"},
+            lambda response: "commit_hash" in response and "commit_date" in response,
         )
         if response and "commit_hash" in response and "commit_date" in response:
             return response
@@ -96,31 +514,31 @@ class API:
             return None
 
         data = {"license_key": license, "action": "get_user_modules"}
-        response = self._post_request(
-            "https://api.masterking32.com/mcf_bot/api.php", data
+        response = self._cached_post_request(
+            "https://api.masterking32.com/mcf_bot/api.php",
+            data,
+            lambda response: is_success(response) and "modules" in response,
         )
         if response and response.get("status") == "success" and "modules" in response:
             return response["modules"]
         return None
 
     def get_public_ip(self, retry=5):
-        if retry == 0:
-            return "127.0.0.1"
-
+        response = self._request(
+            "GET", "https://api.masterking32.com/ip.php?json=true", retry
+        )
         try:
-            response = requests.get("https://api.masterking32.com/ip.php?json=true")
-            if response.status_code == 200:
+            if response is not None and response.status_code == 200:
                 return response.json()["ipAddress"]
-            else:
-                return self.get_public_ip(retry - 1)
         except Exception:
-            return self.get_public_ip(retry - 1)
+            pass
+        return "127.0.0.1"
 
     def check_telegram_access(self, retries=3):
         telegram_api_url = "https://api.telegram.org/connection-test"
 
         try:
-            response = requests.get(telegram_api_url, timeout=5)
+            response = get_session().get(telegram_api_url, timeout=5)
             # This request should return 404
             # cause it's not a valid endpoint
             # but it's used to check if the bot has access to the telegram API
@@ -179,3 +597,183 @@ class API:
         except Exception as e:
             self.log.error(f"<r>⭕ {e} failed to get data!</r>")
             return None
+
+
+class AsyncAPI:
+    # Same calls as API for code running in an event loop, nothing blocks it.
+    def __init__(self, logger):
+        self.logger = logger
+
+    async def _request(self, method, url, retries=5, **kwargs):
+        breaker = get_breaker(url)
+        result = None
+        for attempt in range(retries):
+            if not breaker.allow_request():
+                return result
+            if attempt > 0:
+                await asyncio.sleep(get_backoff(attempt - 1))
+
+            try:
+                async with get_async_session().request(
+                    method, url, **kwargs
+                ) as response:
+                    result = (response.status, await response.text())
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                result = None
+                record_failure(self.logger, breaker, url)
+                continue
+            except BaseException:
+                # Cancelled or failed to decode, release a half-open probe too.
+                record_failure(self.logger, breaker, url)
+                raise
+
+            if result[0] not in RETRY_STATUS_CODES:
+                record_success(self.logger, breaker, url)
+                return result
+            record_failure(self.logger, breaker, url)
+        return result
+
+    async def _cached_post_request(self, url, data, is_valid):
+        ttl = CACHE_TTLS.get(data.get("action"))
+        if ttl is None:
+            return await self._post_request(url, data)
+
+        key = url + "?" + json.dumps(data, sort_keys=True)
+        return await response_cache.get_async(
+            key,
+            ttl,
+            lambda: self._post_request(url, data),
+            is_valid,
+            lambda age: log_cache_fallback(self.logger, age),
+        )
+
+    async def _post_request(self, url, data, retries=5):
+        result = await self._request("POST", url, retries, data=data)
+        if result is None or result[0] in RETRY_STATUS_CODES:
+            return None
+        return parse_post_response(*result)
+
+    async def validate_license(self, license):
+        data = {"license_key": license, "action": "get_license"}
+        response = await self._cached_post_request(
+            "https://api.masterking32.com/mcf_bot/api.php", data, is_success
+        )
+        if is_success(response):
+            return response
+        return None
+
+    async def get_modules(self, license):
+        data = {"license_key": license, "action": "get_modules"}
+        response = await self._cached_post_request(
+            "https://api.masterking32.com/mcf_bot/api.php", data, is_success
+        )
+        if response:
+            if is_success(response):
+                return response
+            return {
+                "error": response.get(
+                    "message", "Unable to get modules, please try again later"
+                )
+            }
+        return {"error": "Unable to get modules, please try again later"}
+
+    async def install_module(self, license, module_id):
+        data = {
+            "license_key": license,
+            "action": "install_module",
+            "module_id": module_id,
+        }
+        response = await self._post_request(
+            "https://api.masterking32.com/mcf_bot/api.php", data
+        )
+        if response:
+            if is_success(response):
+                response_cache.clear()
+                return response
+            return {
+                "error": response.get(
+                    "message", "Unable to install module, please try again later"
+                )
+            }
+        return {"error": "Unable to install module, please try again later"}
+
+    async def get_mcf_version(self):
+        response = await self._cached_post_request(
+            "https://api.masterking32.com/mcf_bot/mcf_version.php",
+            {"action": "get_mcf_version"},
+            lambda response: "commit_hash" in response and "commit_date" in response,
+        )
+        if response and "commit_hash" in response and "commit_date" in response:
+            return response
+        return None
+
+    async def get_user_modules(self, license):
+        if license == "Free License":
+            return None
+
+        data = {"license_key": license, "action": "get_user_modules"}
+        response = await self._cached_post_request(
+            "https://api.masterking32.com/mcf_bot/api.php",
+            data,
+            lambda response: is_success(response) and "modules" in response,
+        )
+        if is_success(response) and "modules" in response:
+            return response["modules"]
+        return None
+
+    async def get_public_ip(self, retry=5):
+        result = await self._request(
+            "GET", "https://api.masterking32.com/ip.php?json=true", retry
+        )
+        try:
+            if result is not None and result[0] == 200:
+                return json.loads(result[1])["ipAddress"]
+        except Exception:
+            pass
+        return "127.0.0.1"
+
+    async def check_telegram_access(self, retries=3):
+        # A 404 with an "ok" field means the Telegram API is reachable.
+        result = await self._request(
+            "GET",
+            "https://api.telegram.org/connection-test",
+            retries + 1,
+            timeout=aiohttp.ClientTimeout(total=5),
+        )
+        try:
+            if result is not None and result[0] == 404:
+                return "ok" in json.loads(result[1])
+        except Exception:
+            pass
+        return False
+
+    async def get_task_answer(self, license_key, data):
+        if license_key is None:
+            return None
+
+        try:
+            data["license_key"] = license_key
+            return await self._post_request(
+                "https://api.masterking32.com/mcf_bot/api.php", data
+            )
+        except Exception as e:
+            self.logger.error(f"<r>⭕ {e} failed to get data!</r>")
+            return None
+
+    async def get_tv(self, license_key, tool_name):
+        if license_key is None:
+            return None
+
+        data = {
+            "license_key": license_key,
+            "tool_name": tool_name,
+            "action": "tools_version",
+        }
+
+        try:
+            return await self._post_request(
+                "https://api.masterking32.com/mcf_bot/api.php", data
+            )
+        except Exception as e:
+            self.logger.error(f"<r>⭕ {e} failed to get data!</r>")
+            return None
@@ -3,112 +3,355 @@
 # Github: https://github.com/masterking32
 # Telegram: https://t.me/MasterCryptoFarmBot
 
+import hashlib
+import json
 import os
+import re
 import sqlite3
+import threading
 from contextlib import contextmanager
 
+from mcf_utils.db_metrics import MetricsConnection, db_metrics
+
+CACHED_STATEMENTS = 256
+
+local_connections = threading.local()
+
+
+def connect(db_name, check_same_thread=True):
+    # timeout=0, MetricsConnection waits for busy locks itself to time them.
+    conn = sqlite3.connect(
+        db_name,
+        timeout=0,
+        cached_statements=CACHED_STATEMENTS,
+        check_same_thread=check_same_thread,
+        factory=MetricsConnection,
+    )
+    try:
+        # WAL lets the core, the modules and the panel read while one writes.
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+    except sqlite3.Error:
+        pass
+    return conn
+
+
+def get_pooled_connection(db_name):
+    # One connection per thread and database, reopened after a fork.
+    if getattr(local_connections, "pid", None) != os.getpid():
+        local_connections.pid = os.getpid()
+        local_connections.connections = {}
+
+    db_path = os.path.abspath(db_name)
+    conn = local_connections.connections.get(db_path)
+    if conn is None:
+        conn = connect(db_path)
+        local_connections.connections[db_path] = conn
+    return conn
+
 
 @contextmanager
 def get_db_connection(db_name, logger):
-    conn = sqlite3.connect(db_name)
+    conn = get_pooled_connection(db_name)
+    in_transaction = conn.in_transaction
     try:
         yield conn
     except Exception as e:
         logger.error(f"<red>❌ Database Error: {e}</red>")
     finally:
-        conn.close()
+        # The connection is reused, never leave a transaction open on it.
+        if conn.in_transaction and not in_transaction:
+            conn.rollback()
+
+
+class SettingsCache:
+    def __init__(self, db_name):
+        self.db_name = db_name
+        self.lock = threading.Lock()
+        self.conn = None
+        self.pid = None
+        self.settings = None
+        self.module_states = None
+        self.data_version = None
+
+    def _get_connection(self):
+        if self.conn is None or self.pid != os.getpid():
+            # A forked process must not share the parent's connection.
+            self.conn = connect(self.db_name, check_same_thread=False)
+            self.pid = os.getpid()
+            self.settings = None
+            self.module_states = None
+        return self.conn
+
+    def _refresh(self):
+        conn = self._get_connection()
+        # data_version changes only when another connection commits.
+        data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        if self.settings is not None and data_version == self.data_version:
+            return
+
+        self.settings = dict(conn.execute("SELECT name, value FROM settings"))
+        self.module_states = None
+        self.data_version = data_version
+
+    def get(self, key, default=None):
+        return self.get_many([key], default)[key]
+
+    def get_many(self, keys, default=None):
+        with self.lock:
+            try:
+                self._refresh()
+            except Exception:
+                self.settings = None
+                raise
+            return {key: self.settings.get(key, default) for key in keys}
+
+    def get_module_states(self):
+        with self.lock:
+            try:
+                self._refresh()
+                if self.module_states is None:
+                    self.module_states = load_module_states(self.conn)
+            except Exception:
+                self.settings = None
+                raise
+            return {module: dict(state) for module, state in self.module_states.items()}
+
+    def set(self, key, value):
+        self.set_many({key: value})
+
+    def set_many(self, settings):
+        with self.lock:
+            conn = self._get_connection()
+            try:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO settings (name, value) VALUES (?, ?)",
+                    list(settings.items()),
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            if self.settings is not None:
+                # Read back the stored values, the column affinity may convert them.
+                for key in settings:
+                    row = conn.execute(
+                        "SELECT value FROM settings WHERE name = ?", (key,)
+                    ).fetchone()
+                    self.settings[key] = row[0] if row else None
+
+    def delete(self, key):
+        with self.lock:
+            conn = self._get_connection()
+            try:
+                conn.execute("DELETE FROM settings WHERE name = ?", (key,))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            if self.settings is not None:
+                self.settings.pop(key, None)
+
+
+def load_module_states(conn):
+    # Every module:<name> namespace in one range scan over the primary key.
+    module_states = {}
+    rows = conn.execute(
+        "SELECT namespace, key, value FROM kv_store WHERE namespace >= 'module:' AND namespace < 'module;'"
+    )
+    for namespace, key, value in rows:
+        module_states.setdefault(namespace[7:], {})[key] = json.loads(value)
+    return module_states
+
+
+SQL_COMMENTS = re.compile(r"/\*.*?\*/|--[^\n]*", re.S)
+TRANSACTION_STATEMENT = re.compile(
+    r"^\s*(BEGIN(\s+(DEFERRED|IMMEDIATE|EXCLUSIVE))?|COMMIT|END)(\s+TRANSACTION)?\s*;?\s*$",
+    re.I,
+)
+
+
+settings_caches = {}
+settings_caches_lock = threading.Lock()
+
+
+def get_settings_cache(db_name):
+    db_path = os.path.abspath(db_name)
+    with settings_caches_lock:
+        if db_path not in settings_caches:
+            settings_caches[db_path] = SettingsCache(db_path)
+        return settings_caches[db_path]
 
 
 class Database:
     def __init__(self, db_name, logger):
         self.db_name = db_name
         self.logger = logger
+        db_metrics.set_logger(logger)
 
     def migration(self):
         with get_db_connection(self.db_name, self.logger) as conn:
-            cursor = conn.cursor()
             self.logger.info(f"<blue>💽 Database Check and Migration ...</blue>")
+            self._create_migration_table(
+                conn,
+                "migration",
+                "CREATE TABLE migration (id INTEGER PRIMARY KEY AUTOINCREMENT, version INTEGER, checksum TEXT);",
+            )
 
-            query = "SELECT name FROM sqlite_master WHERE type='table' AND name='migration';"
-            cursor.execute(query)
-            result = cursor.fetchall()
-            if not result:
-                self.logger.info(f"<green>└─ 🗒️ Creating migration table ...</green>")
-                query = "CREATE TABLE migration (id INTEGER PRIMARY KEY AUTOINCREMENT, version INTEGER);"
-                cursor.execute(query)
-                conn.commit()
-
-            migrations = sorted(os.listdir("database_migrations"))
-            for migration in migrations:
-                if not migration.endswith(".sql"):
-                    continue
-
-                sql_id = migration.split(".")[0]
-                query = "SELECT * FROM migration WHERE version = ?"
-                cursor.execute(query, (sql_id,))
-                result = cursor.fetchall()
-                if not result:
-                    self.logger.info(f"<green>└─ 🔍 Migrating {migration} ...</green>")
-                    with open(f"database_migrations/{migration}", "r") as file:
-                        query = file.read()
-                        cursor.executescript(query)
-                        fileName = migration.split(".")[0]
-                        query = "INSERT INTO migration (version) VALUES (?)"
-                        cursor.execute(query, (fileName,))
-                        conn.commit()
+            applied = {}
+            for version, checksum in conn.execute(
+                "SELECT version, checksum FROM migration"
+            ):
+                applied[(self._parse_version(version),)] = checksum
 
+            migrations = [
+                ((version,), migration, path)
+                for version, migration, path in self._list_migrations(
+                    "database_migrations"
+                )
+            ]
+            self._apply_migrations(
+                conn,
+                migrations,
+                applied,
+                "INSERT INTO migration (checksum, version) VALUES (?, ?)",
+                "UPDATE migration SET checksum = ? WHERE version = ?",
+            )
             self.logger.info(f"<green>✅ Database Check and Migration Done!</green>")
 
     def migration_modules(self, modules):
         with get_db_connection(self.db_name, self.logger) as conn:
-            cursor = conn.cursor()
             self.logger.info(
                 f"<blue>💽 Database Modules Check and Migration ...</blue>"
             )
+            self._create_migration_table(
+                conn,
+                "modules_migration",
+                "CREATE TABLE modules_migration (id INTEGER PRIMARY KEY AUTOINCREMENT, module TEXT, version INTEGER, checksum TEXT);",
+            )
 
-            query = "SELECT name FROM sqlite_master WHERE type='table' AND name='modules_migration';"
-            cursor.execute(query)
-            result = cursor.fetchall()
-            if not result:
-                self.logger.info(
-                    f"<green>└─ 🗒️ Creating modules_migration table ...</green>"
-                )
-                query = "CREATE TABLE modules_migration (id INTEGER PRIMARY KEY AUTOINCREMENT, module TEXT, version INTEGER);"
-                cursor.execute(query)
-                conn.commit()
+            applied = {}
+            for module, version, checksum in conn.execute(
+                "SELECT module, version, checksum FROM modules_migration"
+            ):
+                applied[(module, self._parse_version(version))] = checksum
 
+            migrations = []
             for module in modules:
-                if not os.path.exists(f"modules/{module}/database_migrations"):
-                    continue
-
-                migrations = sorted(os.listdir(f"modules/{module}/database_migrations"))
-                for migration in migrations:
-                    if not migration.endswith(".sql"):
-                        continue
-
-                    query = "SELECT * FROM modules_migration WHERE module = ? AND version = ?"
-
-                    sql_id = migration.split(".")[0]
-                    cursor.execute(query, (module, sql_id))
-                    result = cursor.fetchall()
-                    if not result:
-                        self.logger.info(
-                            f"<green>└─ 🔍 Migrating {module}/{migration} ...</green>"
-                        )
-                        with open(
-                            f"modules/{module}/database_migrations/{migration}", "r"
-                        ) as file:
-                            query = file.read()
-                            cursor.executescript(query)
-                            fileName = migration.split(".")[0]
-                            query = "INSERT INTO modules_migration (module, version) VALUES (?, ?)"
-                            cursor.execute(query, (module, fileName))
-                            conn.commit()
+                for version, migration, path in self._list_migrations(
+                    f"modules/{module}/database_migrations"
+                ):
+                    migrations.append(
+                        ((module, version), f"{module}/{migration}", path)
+                    )
 
+            self._apply_migrations(
+                conn,
+                migrations,
+                applied,
+                "INSERT INTO modules_migration (checksum, module, version) VALUES (?, ?, ?)",
+                "UPDATE modules_migration SET checksum = ? WHERE module = ? AND version = ?",
+            )
             self.logger.info(
                 f"<green>✅ Database Modules Check and Migration Done!</green>"
             )
 
+    def _create_migration_table(self, conn, table, create_query):
+        columns = [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+        if not columns:
+            self.logger.info(f"<green>└─ 🗒️ Creating {table} table ...</green>")
+            conn.execute(create_query)
+            conn.commit()
+        elif "checksum" not in columns:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN checksum TEXT")
+            conn.commit()
+
+    def _parse_version(self, version):
+        if isinstance(version, str) and version.isdigit():
+            return int(version)
+        return version
+
+    def _list_migrations(self, directory):
+        if not os.path.exists(directory):
+            return []
+
+        migrations = []
+        for migration in os.listdir(directory):
+            if not migration.endswith(".sql"):
+                continue
+
+            version = self._parse_version(migration.split(".")[0])
+            migrations.append((version, migration, os.path.join(directory, migration)))
+
+        # Numeric versions first and in numeric order, so 2.sql runs before 10.sql.
+        return sorted(
+            migrations,
+            key=lambda item: (
+                not isinstance(item[0], int),
+                item[0] if isinstance(item[0], int) else 0,
+                str(item[0]),
+            ),
+        )
+
+    def _split_statements(self, script):
+        # executescript() commits on its own, run each statement in the transaction.
+        # Split at each ";" that ends a complete statement, so several
+        # statements on one line and ";" inside strings or triggers both work.
+        statements = []
+        start = 0
+        end = script.find(";")
+        while end != -1:
+            statement = script[start : end + 1]
+            if sqlite3.complete_statement(statement):
+                statements.append(statement)
+                start = end + 1
+            end = script.find(";", end + 1)
+
+        if script[start:].strip():
+            statements.append(script[start:])
+
+        # Scripts that wrap themselves in BEGIN/COMMIT join the migration
+        # transaction instead, a nested BEGIN would fail.
+        return [
+            statement
+            for statement in statements
+            if not TRANSACTION_STATEMENT.match(SQL_COMMENTS.sub("", statement))
+        ]
+
+    def _apply_migrations(self, conn, migrations, applied, insert_query, update_query):
+        pending = []
+        checksums = []
+        for key, name, path in migrations:
+            with open(path, "r") as file:
+                script = file.read()
+            checksum = hashlib.sha256(script.encode()).hexdigest()
+
+            if key not in applied:
+                pending.append((key, name, script, checksum))
+            elif applied[key] is None:
+                checksums.append((checksum,) + key)
+            elif applied[key] != checksum:
+                self.logger.warning(
+                    f"<yellow>└─ ⚠️ {name} was changed after it was applied!</yellow>"
+                )
+
+        if not pending and not checksums:
+            return
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Migrations applied before checksums were stored are trusted as is.
+            conn.executemany(update_query, checksums)
+            for key, name, script, checksum in pending:
+                self.logger.info(f"<green>└─ 🔍 Migrating {name} ...</green>")
+                for statement in self._split_statements(script):
+                    conn.execute(statement)
+                conn.execute(insert_query, (checksum,) + key)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
     def query(self, query, data):
         with get_db_connection(self.db_name, self.logger) as conn:
             cursor = conn.cursor()
@@ -121,28 +364,159 @@ class Database:
             cursor.executescript(query)
             return cursor.fetchall()
 
+    @contextmanager
+    def transaction(self):
+        conn = get_pooled_connection(self.db_name)
+        if conn.in_transaction:
+            # Nested transactions join the outer one.
+            yield conn
+            return
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def _get_transaction_connection(self):
+        # Inside transaction(), settings go through the transaction connection.
+        conn = get_pooled_connection(self.db_name)
+        return conn if conn.in_transaction else None
+
     def getSettings(self, key, default=None):
-        with get_db_connection(self.db_name, self.logger) as conn:
-            cursor = conn.cursor()
-            query = "SELECT value FROM settings WHERE name = ?"
-            cursor.execute(query, (key,))
-            result = cursor.fetchall()
-            if result:
-                return result[0][0]
-            return default
+        return self.getSettingsMany([key], default).get(key)
+
+    def getSettingsMany(self, keys, default=None):
+        try:
+            conn = self._get_transaction_connection()
+            if conn is None:
+                return get_settings_cache(self.db_name).get_many(keys, default)
+
+            settings = {}
+            for key in keys:
+                row = conn.execute(
+                    "SELECT value FROM settings WHERE name = ?", (key,)
+                ).fetchone()
+                settings[key] = row[0] if row else default
+            return settings
+        except Exception as e:
+            self.logger.error(f"<red>❌ Database Error: {e}</red>")
+            return {}
 
     def updateSettings(self, key, value):
-        with get_db_connection(self.db_name, self.logger) as conn:
-            cursor = conn.cursor()
-            query = "INSERT OR REPLACE INTO settings (name, value) VALUES (?, ?)"
-            cursor.execute(query, (key, value))
-            conn.commit()
+        return self.updateSettingsMany({key: value})
+
+    def updateSettingsMany(self, settings):
+        try:
+            conn = self._get_transaction_connection()
+            if conn is None:
+                get_settings_cache(self.db_name).set_many(settings)
+            else:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO settings (name, value) VALUES (?, ?)",
+                    list(settings.items()),
+                )
             return True
+        except Exception as e:
+            self.logger.error(f"<red>❌ Database Error: {e}</red>")
+            return None
 
     def deleteSettings(self, key):
+        try:
+            conn = self._get_transaction_connection()
+            if conn is None:
+                get_settings_cache(self.db_name).delete(key)
+            else:
+                conn.execute("DELETE FROM settings WHERE name = ?", (key,))
+            return True
+        except Exception as e:
+            self.logger.error(f"<red>❌ Database Error: {e}</red>")
+            return None
+
+    def getValue(self, namespace, key, default=None):
         with get_db_connection(self.db_name, self.logger) as conn:
-            cursor = conn.cursor()
-            query = "DELETE FROM settings WHERE name = ?"
-            cursor.execute(query, (key,))
-            conn.commit()
+            row = conn.execute(
+                "SELECT value FROM kv_store WHERE namespace = ? AND key = ?",
+                (namespace, key),
+            ).fetchone()
+            return json.loads(row[0]) if row else default
+        return default
+
+    def getValues(self, namespace):
+        with get_db_connection(self.db_name, self.logger) as conn:
+            rows = conn.execute(
+                "SELECT key, value FROM kv_store WHERE namespace = ?", (namespace,)
+            )
+            return {key: json.loads(value) for key, value in rows}
+        return {}
+
+    def setValues(self, namespace, values):
+        try:
+            with self.transaction() as conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO kv_store (namespace, key, value) VALUES (?, ?, ?)",
+                    [
+                        (namespace, key, json.dumps(value))
+                        for key, value in values.items()
+                    ],
+                )
+            return True
+        except Exception as e:
+            self.logger.error(f"<red>❌ Database Error: {e}</red>")
+            return None
+
+    def setValue(self, namespace, key, value):
+        return self.setValues(namespace, {key: value})
+
+    def deleteValue(self, namespace, key):
+        try:
+            with self.transaction() as conn:
+                conn.execute(
+                    "DELETE FROM kv_store WHERE namespace = ? AND key = ?",
+                    (namespace, key),
+                )
+            return True
+        except Exception as e:
+            self.logger.error(f"<red>❌ Database Error: {e}</red>")
+            return None
+
+    def getModuleStates(self):
+        # Cached like the settings, until another connection commits.
+        try:
+            conn = self._get_transaction_connection()
+            if conn is None:
+                return get_settings_cache(self.db_name).get_module_states()
+            return load_module_states(conn)
+        except Exception as e:
+            self.logger.error(f"<red>❌ Database Error: {e}</red>")
+            return {}
+
+    def getModuleState(self, module):
+        return self.getModuleStates().get(module, {})
+
+    def isModuleDisabled(self, module):
+        return self.getModuleState(module).get("disabled", False) is True
+
+    def setModuleDisabled(self, module, disabled):
+        try:
+            with self.transaction() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO kv_store (namespace, key, value) VALUES (?, ?, ?)",
+                    (f"module:{module}", "disabled", json.dumps(bool(disabled))),
+                )
+                # Modules still read the <module>_disabled setting, keep it in sync.
+                if disabled:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO settings (name, value) VALUES (?, ?)",
+                        (f"{module}_disabled", "1"),
+                    )
+                else:
+                    conn.execute(
+                        "DELETE FROM settings WHERE name = ?", (f"{module}_disabled",)
+                    )
             return True
+        except Exception as e:
+            self.logger.error(f"<red>❌ Database Error: {e}</red>")
+            return None
@@ -0,0 +1,203 @@
+# Developed by: MasterkinG32
+# Date: 2024
+# Github: https://github.com/masterking32
+# Telegram: https://t.me/MasterCryptoFarmBot
+
+import bisect
+import re
+import sqlite3
+import threading
+import time
+
+HISTOGRAM_BUCKETS_MS = [1, 5, 10, 50, 100, 500, 1000, 5000]
+MAX_STATEMENT_LENGTH = 200
+SQLITE_BUSY_SNAPSHOT = 517
+DEFAULT_SLOW_QUERY_MS = 500
+BUSY_TIMEOUT = 30
+
+
+class StatementMetrics:
+    __slots__ = ("count", "errors", "total_ms", "max_ms", "busy_ms", "histogram")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.busy_ms = 0.0
+        self.histogram = [0] * (len(HISTOGRAM_BUCKETS_MS) + 1)
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "total_ms": round(self.total_ms, 3),
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else 0,
+            "max_ms": round(self.max_ms, 3),
+            "busy_ms": round(self.busy_ms, 3),
+            "histogram": {
+                (
+                    f"<={HISTOGRAM_BUCKETS_MS[i]}ms"
+                    if i < len(HISTOGRAM_BUCKETS_MS)
+                    else f">{HISTOGRAM_BUCKETS_MS[-1]}ms"
+                ): count
+                for i, count in enumerate(self.histogram)
+            },
+        }
+
+
+class DatabaseMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.statements = {}
+        self.start_time = time.time()
+        self.logger = None
+        self.slow_query_ms = None
+
+    def set_logger(self, logger):
+        if self.logger is None:
+            self.logger = logger
+
+    def _get_slow_query_ms(self):
+        if self.slow_query_ms is None:
+            try:
+                import config
+
+                self.slow_query_ms = config.config.get(
+                    "db_slow_query_ms", DEFAULT_SLOW_QUERY_MS
+                )
+            except Exception as e:
+                self.slow_query_ms = DEFAULT_SLOW_QUERY_MS
+        return self.slow_query_ms
+
+    def _normalize(self, sql):
+        statement = re.sub(r"\s+", " ", sql).strip()
+        return statement[:MAX_STATEMENT_LENGTH]
+
+    def _is_busy(self, error):
+        if getattr(error, "sqlite_errorcode", None) == SQLITE_BUSY_SNAPSHOT:
+            # The read snapshot is stale, waiting for the lock can not help.
+            return False
+        message = str(error).lower()
+        return "database is locked" in message or "database is busy" in message
+
+    def run(self, sql, func, retry=True):
+        # SQLite's own busy handler can not be timed, so connections are opened
+        # with timeout=0 and the wait for the lock happens here instead.
+        busy_ms = 0.0
+        delay = 0.001
+        start_time = time.perf_counter()
+        while True:
+            attempt_time = time.perf_counter()
+            try:
+                result = func()
+                break
+            except sqlite3.OperationalError as e:
+                if not retry or not self._is_busy(e) or busy_ms >= BUSY_TIMEOUT * 1000:
+                    self._record(sql, start_time, busy_ms, True)
+                    raise
+
+                time.sleep(delay)
+                busy_ms += (time.perf_counter() - attempt_time) * 1000
+                delay = min(delay * 2, 0.1)
+            except Exception:
+                self._record(sql, start_time, busy_ms, True)
+                raise
+
+        self._record(sql, start_time, busy_ms, False)
+        return result
+
+    def _record(self, sql, start_time, busy_ms, error):
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+        statement = self._normalize(sql)
+        with self.lock:
+            metrics = self.statements.get(statement)
+            if metrics is None:
+                metrics = StatementMetrics()
+                self.statements[statement] = metrics
+
+            metrics.count += 1
+            metrics.errors += 1 if error else 0
+            metrics.total_ms += elapsed_ms
+            metrics.max_ms = max(metrics.max_ms, elapsed_ms)
+            metrics.busy_ms += busy_ms
+            metrics.histogram[bisect.bisect_left(HISTOGRAM_BUCKETS_MS, elapsed_ms)] += 1
+
+        slow_query_ms = self._get_slow_query_ms()
+        if slow_query_ms and elapsed_ms >= slow_query_ms and self.logger is not None:
+            self.logger.warning(
+                f"<yellow>🐢 Slow query ({elapsed_ms:.0f} ms, {busy_ms:.0f} ms waiting for lock): <cyan>{statement}</cyan></yellow>"
+            )
+
+    def snapshot(self):
+        with self.lock:
+            statements = [
+                dict(statement=statement, **metrics.to_dict())
+                for statement, metrics in self.statements.items()
+            ]
+
+        statements.sort(key=lambda statement: statement["total_ms"], reverse=True)
+        return {
+            "since": int(self.start_time),
+            "queries": sum(statement["count"] for statement in statements),
+            "errors": sum(statement["errors"] for statement in statements),
+            "total_ms": round(sum(s["total_ms"] for s in statements), 3),
+            "busy_ms": round(sum(s["busy_ms"] for s in statements), 3),
+            "statements": statements,
+        }
+
+    def reset(self):
+        with self.lock:
+            self.statements = {}
+            self.start_time = time.time()
+
+
+db_metrics = DatabaseMetrics()
+
+
+class MetricsCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        return db_metrics.run(
+            sql, lambda: super(MetricsCursor, self).execute(sql, parameters)
+        )
+
+    def executemany(self, sql, seq_of_parameters):
+        # A retry needs the parameters again, a generator can only be used once.
+        seq_of_parameters = list(seq_of_parameters)
+        return db_metrics.run(
+            sql,
+            lambda: super(MetricsCursor, self).executemany(sql, seq_of_parameters),
+        )
+
+    def executescript(self, sql_script):
+        # A script runs statement by statement outside a transaction and can not
+        # be retried, let SQLite wait for the lock instead.
+        conn = self.connection
+        sqlite3.Connection.execute(conn, f"PRAGMA busy_timeout = {BUSY_TIMEOUT * 1000}")
+        try:
+            return db_metrics.run(
+                sql_script,
+                lambda: super(MetricsCursor, self).executescript(sql_script),
+                retry=False,
+            )
+        finally:
+            sqlite3.Connection.execute(conn, "PRAGMA busy_timeout = 0")
+
+
+class MetricsConnection(sqlite3.Connection):
+    # Connection.execute() does not go through cursor().execute() in C, so the
+    # shortcuts are routed through MetricsCursor here.
+    def cursor(self, factory=MetricsCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+    def commit(self):
+        return db_metrics.run("COMMIT", super().commit)
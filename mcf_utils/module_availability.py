@@ -0,0 +1,113 @@
+# Developed by: MasterkinG32
+# Date: 2024
+# Github: https://github.com/masterking32
+# Telegram: https://t.me/MasterCryptoFarmBot
+
+import asyncio
+import concurrent.futures
+import threading
+import time
+
+from mcf_utils.api import AsyncAPI
+
+AVAILABLE_TTL = 600
+UNAVAILABLE_TTL = 60
+
+
+class ModuleAvailability:
+    # Shared by every account thread of a module, each thread runs its own
+    # event loop, so waiters use a concurrent future instead of a task.
+    def __init__(
+        self,
+        logger,
+        license,
+        module_name,
+        version,
+        ttl=AVAILABLE_TTL,
+        negative_ttl=UNAVAILABLE_TTL,
+    ):
+        self.logger = logger
+        self.license = license
+        self.module_name = module_name
+        self.version = version
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.lock = threading.Lock()
+        self.status = None
+        self.checked_time = 0
+        self.inflight = None
+
+    async def is_available(self):
+        if not self.license or not self.module_name:
+            return False
+
+        if not self.version:
+            return True
+
+        with self.lock:
+            if self.status is not None:
+                ttl = self.ttl if self.status else self.negative_ttl
+                if time.time() - self.checked_time < ttl:
+                    return self.status
+
+            future = self.inflight
+            leader = future is None
+            if leader:
+                future = concurrent.futures.Future()
+                self.inflight = future
+
+        if not leader:
+            # shield(), a cancelled waiter must not cancel the shared check.
+            return await asyncio.shield(asyncio.wrap_future(future))
+
+        try:
+            status = await self._check()
+        except BaseException:
+            # Cancelled or failed, waiters get the last answer and nothing is cached.
+            with self.lock:
+                self.inflight = None
+            future.set_result(bool(self.status))
+            raise
+
+        with self.lock:
+            self.inflight = None
+            if status is None:
+                # No answer from the API, keep the last known status uncached.
+                status = bool(self.status)
+            else:
+                self.status = status
+                self.checked_time = time.time()
+        future.set_result(status)
+        return status
+
+    async def _check(self):
+        response = await AsyncAPI(self.logger).get_task_answer(
+            self.license,
+            {
+                "action": "version_check",
+                "module_name": self.module_name,
+                "version": self.version,
+            },
+        )
+
+        if response is None:
+            # Network error or the circuit breaker failing fast, not an answer.
+            self.logger.error(
+                "<yellow>🟡 Unable to check the module version, please try again later.</yellow>"
+            )
+            return None
+
+        if "error" in response:
+            self.logger.error(f"<yellow>⭕ API Error: {response['error']}</yellow>")
+            return False
+
+        if response.get("status") == "success":
+            return True
+
+        if response.get("status") == "error" and "message" in response:
+            self.logger.info(f"<yellow>🟡 {response['message']}</yellow>")
+        else:
+            self.logger.error(
+                "<yellow>🟡 Unable to check the module version, please try again later.</yellow>"
+            )
+        return False
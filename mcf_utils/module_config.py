@@ -0,0 +1,143 @@
+# Developed by: MasterkinG32
+# Date: 2024
+# Github: https://github.com/masterking32
+# Telegram: https://t.me/MasterCryptoFarmBot
+
+import copy
+import json
+import os
+import threading
+
+SETTINGS_FILE = "bot_settings.json"
+ACCOUNTS_FILE = "accounts.json"
+DISABLED_SESSIONS_FILE = "disabled_sessions.json"
+TELEGRAM_ACCOUNTS_FILE = os.path.join("telegram_accounts", "accounts.json")
+
+
+class ModuleConfig:
+    # Module side view of its settings and accounts. refresh() is called at
+    # account boundaries, so changes apply without restarting the module.
+    def __init__(self, module_dir, mcf_dir, log=None):
+        self.log = log
+        self.lock = threading.Lock()
+        self.files = {
+            "settings": (os.path.join(module_dir, SETTINGS_FILE), {}),
+            "accounts": (os.path.join(module_dir, ACCOUNTS_FILE), []),
+            "disabled_sessions": (
+                os.path.join(module_dir, DISABLED_SESSIONS_FILE),
+                [],
+            ),
+            "telegram_accounts": (os.path.join(mcf_dir, TELEGRAM_ACCOUNTS_FILE), []),
+        }
+        self.stats = {}
+        self.data = {name: default for name, (_, default) in self.files.items()}
+        self.pending_settings = None
+        self.account_overrides = {}
+        self.disabled_sessions = set()
+        self.disabled_accounts = set()
+        self.refresh()
+
+    def refresh(self):
+        # One stat() per file, files are only parsed again when they changed.
+        changed = []
+        with self.lock:
+            for name, (path, default) in self.files.items():
+                file_stat = self._get_file_stat(path)
+                if file_stat == self.stats.get(name):
+                    continue
+
+                data = self._load_json(path, default)
+                if data is None:
+                    # The file is being written, try again at the next boundary.
+                    continue
+
+                self.stats[name] = file_stat
+                self.data[name] = data
+                changed.append(name)
+
+            if self.pending_settings is not None:
+                self.data["settings"] = self.pending_settings
+                self.pending_settings = None
+                if "settings" not in changed:
+                    changed.append("settings")
+
+            if changed:
+                self._build_indexes()
+                if "accounts" in changed or "disabled_sessions" in changed:
+                    self.account_overrides = {}
+
+        if changed and self.log is not None:
+            self.log.info(f"<g>🔄 Reloaded <c>{', '.join(changed)}</c>.</g>")
+        return changed
+
+    def get(self, key, default=None):
+        with self.lock:
+            return self.data["settings"].get(key, default)
+
+    def get_settings(self):
+        with self.lock:
+            return copy.deepcopy(self.data["settings"])
+
+    def get_accounts(self):
+        with self.lock:
+            return copy.deepcopy(self.data["accounts"])
+
+    def get_telegram_accounts(self):
+        with self.lock:
+            return copy.deepcopy(self.data["telegram_accounts"])
+
+    def get_disabled_sessions(self):
+        with self.lock:
+            return list(self.data["disabled_sessions"])
+
+    def set_settings(self, settings):
+        # Settings pushed by MCF, applied at the next refresh().
+        if not isinstance(settings, dict):
+            return
+        with self.lock:
+            self.pending_settings = settings
+
+    def set_account_disabled(self, session_name, disabled):
+        with self.lock:
+            self.account_overrides[session_name] = bool(disabled)
+
+    def is_account_disabled(self, account):
+        session_name = account.get("session_name")
+        with self.lock:
+            if session_name in self.account_overrides:
+                return self.account_overrides[session_name]
+
+            if account.get("is_pyrogram"):
+                return session_name in self.disabled_sessions
+            return session_name in self.disabled_accounts
+
+    def _build_indexes(self):
+        self.disabled_sessions = set(self.data["disabled_sessions"] or [])
+        self.disabled_sessions.update(
+            account.get("session_name")
+            for account in self.data["telegram_accounts"] or []
+            if account.get("disabled", False)
+        )
+        self.disabled_accounts = set(
+            account.get("session_name")
+            for account in self.data["accounts"] or []
+            if account.get("disabled", False)
+        )
+
+    def _get_file_stat(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _load_json(self, path, default):
+        if not os.path.exists(path):
+            return default
+
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            return None
+        return default if data is None else data
@@ -0,0 +1,245 @@
+# Developed by: MasterkinG32
+# Date: 2024
+# Github: https://github.com/masterking32
+# Telegram: https://t.me/MasterCryptoFarmBot
+
+import json
+import os
+import socket
+import threading
+import time
+
+IPC_FD_ENV = "MCF_IPC_FD"
+DEFAULT_HEARTBEAT_INTERVAL = 30
+MAX_MESSAGE_SIZE = 1024 * 1024
+
+
+class ModuleChannel:
+    # One newline separated JSON message per line, in both directions.
+    def __init__(self, sock):
+        self.sock = sock
+        self.send_lock = threading.Lock()
+        self.closed = False
+
+    def send(self, message):
+        data = json.dumps(message).encode() + b"\n"
+        try:
+            with self.send_lock:
+                self.sock.sendall(data)
+            return True
+        except OSError:
+            self.close()
+            return False
+
+    def read_messages(self):
+        reader = self.sock.makefile("rb")
+        try:
+            while True:
+                line = reader.readline(MAX_MESSAGE_SIZE)
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(message, dict):
+                    yield message
+        except OSError:
+            pass
+        finally:
+            reader.close()
+            self.close()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class ModuleConnection:
+    def __init__(self, module, channel):
+        self.module = module
+        self.channel = channel
+        self.commands = set()
+        self.connected_time = time.time()
+        self.last_heartbeat = None
+        self.metrics = {}
+
+    def to_dict(self):
+        return {
+            "connected": not self.channel.closed,
+            "commands": sorted(self.commands),
+            "last_heartbeat": self.last_heartbeat,
+            "metrics": dict(self.metrics),
+        }
+
+
+class ModuleIPC:
+    # Core side, one socket pair per running module.
+    def __init__(self, logger):
+        self.logger = logger
+        self.lock = threading.Lock()
+        self.connections = {}
+
+    @staticmethod
+    def is_supported():
+        return os.name == "posix" and hasattr(socket, "AF_UNIX")
+
+    def open(self, module):
+        # Returns the module end of the channel, close it once the module started.
+        parent_sock, child_sock = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection = ModuleConnection(module, ModuleChannel(parent_sock))
+        with self.lock:
+            previous = self.connections.get(module)
+            self.connections[module] = connection
+        if previous is not None:
+            previous.channel.close()
+
+        threading.Thread(
+            target=self._read_module, args=(connection,), daemon=True
+        ).start()
+        return child_sock
+
+    def close(self, module):
+        with self.lock:
+            connection = self.connections.pop(module, None)
+        if connection is not None:
+            connection.channel.close()
+
+    def send_command(self, module, command, **data):
+        # False when the module does not handle the command, callers fall back.
+        with self.lock:
+            connection = self.connections.get(module)
+        if connection is None or command not in connection.commands:
+            return False
+
+        return connection.channel.send(dict(data, type="command", command=command))
+
+    def get_status(self, module):
+        with self.lock:
+            connection = self.connections.get(module)
+        if connection is None:
+            return None
+        return connection.to_dict()
+
+    def supports(self, module, command):
+        with self.lock:
+            connection = self.connections.get(module)
+        return connection is not None and command in connection.commands
+
+    def _read_module(self, connection):
+        for message in connection.channel.read_messages():
+            message_type = message.get("type")
+            if message_type == "hello":
+                connection.commands = set(message.get("commands", []))
+                self.logger.info(
+                    f"<green>🔌 <cyan>{connection.module}</cyan> connected to the control channel.</green>"
+                )
+            elif message_type == "heartbeat":
+                connection.last_heartbeat = time.time()
+                if isinstance(message.get("metrics"), dict):
+                    connection.metrics = message["metrics"]
+            elif message_type == "metrics":
+                if isinstance(message.get("metrics"), dict):
+                    connection.metrics.update(message["metrics"])
+
+        with self.lock:
+            if self.connections.get(connection.module) is connection:
+                del self.connections[connection.module]
+
+
+class ModuleClient:
+    # Module side, created with connect().
+    def __init__(self, sock, log=None, heartbeat_interval=None):
+        self.channel = ModuleChannel(sock)
+        self.log = log
+        self.handlers = {}
+        self.metrics = {}
+        self.metrics_lock = threading.Lock()
+        self.heartbeat_interval = heartbeat_interval or _get_heartbeat_interval()
+        self.stopped = threading.Event()
+
+    def on(self, command, handler):
+        self.handlers[command] = handler
+
+    def start(self, on_disconnect=None):
+        self.channel.send(
+            {"type": "hello", "pid": os.getpid(), "commands": list(self.handlers)}
+        )
+        threading.Thread(
+            target=self._read_core, args=(on_disconnect,), daemon=True
+        ).start()
+        threading.Thread(target=self._send_heartbeats, daemon=True).start()
+
+    def set_metric(self, key, value):
+        with self.metrics_lock:
+            self.metrics[key] = value
+
+    def inc_metric(self, key, amount=1):
+        with self.metrics_lock:
+            self.metrics[key] = self.metrics.get(key, 0) + amount
+
+    def send_metrics(self):
+        with self.metrics_lock:
+            metrics = dict(self.metrics)
+        return self.channel.send({"type": "metrics", "metrics": metrics})
+
+    def _send_heartbeats(self):
+        while not self.stopped.is_set():
+            with self.metrics_lock:
+                metrics = dict(self.metrics)
+            if not self.channel.send({"type": "heartbeat", "metrics": metrics}):
+                return
+            self.stopped.wait(self.heartbeat_interval)
+
+    def _read_core(self, on_disconnect):
+        for message in self.channel.read_messages():
+            if message.get("type") != "command":
+                continue
+
+            handler = self.handlers.get(message.get("command"))
+            if handler is None:
+                continue
+
+            try:
+                handler(message)
+            except Exception as e:
+                if self.log is not None:
+                    self.log.error(
+                        f"<r>❌ Control command {message.get('command')} failed: {e}</r>"
+                    )
+
+        self.stopped.set()
+        # The core closes its end when it exits.
+        if on_disconnect is not None:
+            on_disconnect()
+
+
+def _get_heartbeat_interval():
+    try:
+        import config
+
+        return max(
+            config.config.get("module_heartbeat_interval", DEFAULT_HEARTBEAT_INTERVAL),
+            1,
+        )
+    except Exception as e:
+        return DEFAULT_HEARTBEAT_INTERVAL
+
+
+def connect(log=None):
+    # None when the module was not started by MCF with a control channel.
+    fd = os.environ.pop(IPC_FD_ENV, None)
+    if fd is None:
+        return None
+
+    try:
+        sock = socket.socket(fileno=int(fd))
+    except (OSError, ValueError):
+        return None
+    return ModuleClient(sock, log)
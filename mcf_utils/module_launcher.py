@@ -0,0 +1,351 @@
+# Developed by: MasterkinG32
+# Date: 2024
+# Github: https://github.com/masterking32
+# Telegram: https://t.me/MasterCryptoFarmBot
+
+import importlib
+import itertools
+import json
+import os
+import runpy
+import selectors
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import traceback
+
+import psutil
+
+import mcf_utils.module_limits as module_limits
+from mcf_utils.module_ipc import IPC_FD_ENV
+
+PRELOAD_MODULES = [
+    "mcf_utils.logColors",
+    "mcf_utils.utils",
+    "mcf_utils.api",
+    "mcf_utils.database",
+    "mcf_utils.tgAccount",
+    "mcf_utils.tgPyrogram",
+    "mcf_utils.tgTelethon",
+    "pyrogram",
+    "telethon",
+    "cloudscraper",
+    "faker",
+    "loguru",
+    "aiohttp",
+    "requests",
+]
+MAX_MESSAGE_SIZE = 65536
+LAUNCH_TIMEOUT = 30
+PRELOAD_TIMEOUT = 300
+LAUNCH_POLL_INTERVAL = 0.5
+PARENT_CHECK_INTERVAL = 5
+
+
+class LaunchedModule:
+    def __init__(self, pid, stdout):
+        self.pid = pid
+        self.stdout = stdout
+        self.returncode = None
+        self.exited = threading.Event()
+
+    def set_exited(self, returncode):
+        self.returncode = returncode
+        self.exited.set()
+
+    def wait(self, timeout=None):
+        self.exited.wait(timeout)
+        return self.returncode
+
+    def poll(self):
+        return self.returncode
+
+
+class ModuleLauncher:
+    def __init__(self, logger):
+        self.logger = logger
+        self.lock = threading.Lock()
+        self.server = None
+        self.server_ready = None
+        self.sock = None
+        self.request_ids = itertools.count(1)
+        self.pending = {}
+        self.children = {}
+
+    @staticmethod
+    def is_supported():
+        return (
+            hasattr(os, "fork")
+            and hasattr(socket, "send_fds")
+            and hasattr(socket, "SOCK_SEQPACKET")
+        )
+
+    def launch(self, module_path, main_pid, limits=None, ipc_sock=None):
+        reader, writer = os.pipe()
+        try:
+            with self.lock:
+                self._ensure_running()
+                server = self.server
+                server_ready = self.server_ready
+                request_id = next(self.request_ids)
+                launched = {"event": threading.Event(), "module": None}
+                self.pending[request_id] = launched
+                message = {
+                    "id": request_id,
+                    "module_path": module_path,
+                    "main_pid": main_pid,
+                    "limits": limits or {},
+                }
+                fds = [writer]
+                if ipc_sock is not None:
+                    fds.append(ipc_sock.fileno())
+                socket.send_fds(self.sock, [json.dumps(message).encode()], fds)
+        except Exception:
+            os.close(reader)
+            raise
+        finally:
+            os.close(writer)
+
+        # The launch timeout starts once the fork server finished its preload,
+        # and a dead fork server fails the launch right away.
+        deadline = time.monotonic() + PRELOAD_TIMEOUT
+        ready = False
+        while not launched["event"].wait(LAUNCH_POLL_INTERVAL):
+            if server.poll() is not None:
+                break
+            if not ready and server_ready.is_set():
+                ready = True
+                deadline = time.monotonic() + LAUNCH_TIMEOUT
+            if time.monotonic() > deadline:
+                break
+
+        if not launched["event"].is_set():
+            if self.pending.pop(request_id, None) is None:
+                # The reply is being handled right now, take it.
+                launched["event"].wait()
+
+        if launched["module"] is None:
+            os.close(reader)
+            raise RuntimeError("Fork server did not start the module")
+
+        launched["module"].stdout = os.fdopen(reader, "rb", buffering=0)
+        return launched["module"]
+
+    def _ensure_running(self):
+        if self.server is not None:
+            if self.server.poll() is None:
+                return
+            # The reader may not have noticed yet, hand its state over now.
+            self._release_server()
+
+        self.logger.info("<green>🚀 Starting module fork server ...</green>")
+        # SEQPACKET keeps message boundaries and, unlike DGRAM, reports EOF
+        # when the fork server exits.
+        parent_sock, child_sock = socket.socketpair(
+            socket.AF_UNIX, socket.SOCK_SEQPACKET
+        )
+        self.server = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "mcf_utils.module_launcher",
+                str(child_sock.fileno()),
+            ],
+            stdin=subprocess.DEVNULL,
+            pass_fds=[child_sock.fileno()],
+        )
+        child_sock.close()
+        self.sock = parent_sock
+        self.server_ready = threading.Event()
+        threading.Thread(
+            target=self._read_server,
+            args=(parent_sock, self.server_ready),
+            daemon=True,
+        ).start()
+
+    def _read_server(self, sock, server_ready):
+        while True:
+            try:
+                data = sock.recv(MAX_MESSAGE_SIZE)
+                if not data:
+                    break
+                message = json.loads(data)
+            except Exception:
+                break
+
+            if "ready" in message:
+                server_ready.set()
+            elif "id" in message:
+                launched = self.pending.pop(message["id"], None)
+                if launched is None:
+                    # launch() gave up already, do not leave an untracked copy.
+                    self._kill_late_module(message.get("pid"))
+                    continue
+                if message.get("pid"):
+                    module = LaunchedModule(message["pid"], None)
+                    self.children[module.pid] = module
+                    launched["module"] = module
+                launched["event"].set()
+            elif "exit" in message:
+                module = self.children.pop(message["pid"], None)
+                if module is not None:
+                    module.set_exited(message["exit"])
+
+        sock.close()
+        with self.lock:
+            if self.sock is sock:
+                self._release_server()
+
+    def _kill_late_module(self, pid):
+        if not pid:
+            return
+
+        self.logger.warning(
+            f"<yellow>⚠️ Module with PID {pid} started after its launch timed out, killing it!</yellow>"
+        )
+        try:
+            psutil.Process(pid).kill()
+        except psutil.Error:
+            pass
+
+    def _release_server(self):
+        # Called with self.lock held, once per lost fork server.
+        children = list(self.children.values())
+        self.children = {}
+        for launched in self.pending.values():
+            launched["event"].set()
+        self.pending = {}
+        self.sock = None
+
+        # Orphaned modules keep running, watch them by PID from now on.
+        for module in children:
+            threading.Thread(
+                target=self._watch_orphan, args=(module,), daemon=True
+            ).start()
+
+    def _watch_orphan(self, module):
+        try:
+            psutil.Process(module.pid).wait()
+        except psutil.Error:
+            pass
+        module.set_exited(None)
+
+
+def _run_module(message, output_fd, ipc_fd=None):
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    signal.set_wakeup_fd(-1)
+
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    os.close(devnull)
+    os.dup2(output_fd, 1)
+    os.dup2(output_fd, 2)
+    os.close(output_fd)
+
+    if ipc_fd is not None:
+        os.environ[IPC_FD_ENV] = str(ipc_fd)
+
+    exit_code = 0
+    try:
+        module_limits.apply_limits(message.get("limits"))
+        module_path = message["module_path"]
+        sys.argv = [module_path, str(message["main_pid"])]
+        sys.path.insert(0, os.path.dirname(os.path.abspath(module_path)))
+        runpy.run_path(module_path, run_name="__main__")
+    except SystemExit as e:
+        if isinstance(e.code, int):
+            exit_code = e.code
+        elif e.code is not None:
+            print(e.code, file=sys.stderr)
+            exit_code = 1
+    except BaseException:
+        traceback.print_exc()
+        exit_code = 1
+    finally:
+        try:
+            sys.stdout.flush()
+            sys.stderr.flush()
+        except Exception:
+            pass
+        os._exit(exit_code)
+
+
+def _serve(sock):
+    parent_pid = os.getppid()
+    wakeup_reader, wakeup_writer = os.pipe()
+    os.set_blocking(wakeup_reader, False)
+    os.set_blocking(wakeup_writer, False)
+    signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+    signal.set_wakeup_fd(wakeup_writer)
+
+    selector = selectors.DefaultSelector()
+    selector.register(sock, selectors.EVENT_READ)
+    selector.register(wakeup_reader, selectors.EVENT_READ)
+
+    while os.getppid() == parent_pid:
+        for key, _ in selector.select(PARENT_CHECK_INTERVAL):
+            if key.fileobj is wakeup_reader:
+                try:
+                    os.read(wakeup_reader, 4096)
+                except BlockingIOError:
+                    pass
+                _reap_children(sock)
+                continue
+
+            data, fds, _, _ = socket.recv_fds(sock, MAX_MESSAGE_SIZE, 2)
+            if not data:
+                return
+
+            message = json.loads(data)
+            if not fds:
+                sock.send(json.dumps({"id": message["id"], "pid": None}).encode())
+                continue
+
+            sys.stdout.flush()
+            sys.stderr.flush()
+            pid = os.fork()
+            if pid == 0:
+                sock.close()
+                os.close(wakeup_reader)
+                os.close(wakeup_writer)
+                _run_module(message, fds[0], fds[1] if len(fds) > 1 else None)
+
+            for fd in fds:
+                os.close(fd)
+            sock.send(json.dumps({"id": message["id"], "pid": pid}).encode())
+
+
+def _reap_children(sock):
+    while True:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            return
+
+        if pid == 0:
+            return
+
+        exit_code = os.waitstatus_to_exitcode(status)
+        sock.send(json.dumps({"pid": pid, "exit": exit_code}).encode())
+
+
+def main():
+    sock = socket.socket(fileno=int(sys.argv[1]))
+    for module_name in PRELOAD_MODULES:
+        try:
+            importlib.import_module(module_name)
+        except Exception:
+            pass
+
+    try:
+        sock.send(json.dumps({"ready": True}).encode())
+        _serve(sock)
+    except (KeyboardInterrupt, OSError):
+        pass
+
+
+if __name__ == "__main__":
+    main()
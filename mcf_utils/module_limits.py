@@ -0,0 +1,217 @@
+# Developed by: MasterkinG32
+# Date: 2024
+# Github: https://github.com/masterking32
+# Telegram: https://t.me/MasterCryptoFarmBot
+
+import json
+import os
+import threading
+
+import psutil
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+SETTINGS_FILE = "bot_settings.json"
+LIMITS_KEY = "resource_limits"
+CGROUP_ROOT = "/sys/fs/cgroup"
+CORE_CGROUP = "mcf_core"
+CGROUP_CONTROLLERS = ["memory", "cpu"]
+
+cgroup_lock = threading.Lock()
+cgroup_base = None
+cgroup_checked = False
+
+
+def load_module_limits(module_dir):
+    settings_file = os.path.join(module_dir, SETTINGS_FILE)
+    if not os.path.exists(settings_file):
+        return {}
+
+    try:
+        with open(settings_file, "r") as f:
+            limits = json.load(f).get(LIMITS_KEY, {})
+            return limits if isinstance(limits, dict) else {}
+    except Exception as e:
+        return {}
+
+
+def _get_limit(limits, key):
+    try:
+        value = int(limits.get(key, 0))
+        return value if value > 0 else None
+    except (TypeError, ValueError):
+        return None
+
+
+def apply_limits(limits):
+    if resource is None or not limits:
+        return
+
+    max_memory = _get_limit(limits, "max_memory_mb")
+    if max_memory is not None:
+        memory_bytes = max_memory * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+
+    max_cpu_time = _get_limit(limits, "max_cpu_seconds")
+    if max_cpu_time is not None:
+        resource.setrlimit(resource.RLIMIT_CPU, (max_cpu_time, max_cpu_time))
+
+    nice = _get_limit(limits, "nice")
+    if nice is not None:
+        os.nice(nice)
+
+
+def apply_limits_to_process(module, pid, limits, logger):
+    # Applied from the core after spawn, a preexec_fn is not fork safe while
+    # other threads hold locks.
+    if resource is None or not limits:
+        return
+
+    try:
+        process = psutil.Process(pid)
+        max_memory = _get_limit(limits, "max_memory_mb")
+        if max_memory is not None:
+            memory_bytes = max_memory * 1024 * 1024
+            process.rlimit(psutil.RLIMIT_AS, (memory_bytes, memory_bytes))
+
+        max_cpu_time = _get_limit(limits, "max_cpu_seconds")
+        if max_cpu_time is not None:
+            process.rlimit(psutil.RLIMIT_CPU, (max_cpu_time, max_cpu_time))
+
+        nice = _get_limit(limits, "nice")
+        if nice is not None:
+            os.setpriority(
+                os.PRIO_PROCESS, pid, os.getpriority(os.PRIO_PROCESS, 0) + nice
+            )
+    except Exception as e:
+        logger.warning(
+            f"<yellow>⚠️ Unable to apply resource limits to <cyan>{module}</cyan>: {e}</yellow>"
+        )
+
+
+def get_soft_memory_limit(limits):
+    soft_memory = _get_limit(limits or {}, "soft_memory_mb")
+    if soft_memory is None:
+        return None
+    return soft_memory * 1024 * 1024
+
+
+def _get_own_cgroup():
+    try:
+        with open("/proc/self/cgroup", "r") as f:
+            for line in f:
+                if line.startswith("0::"):
+                    return os.path.join(CGROUP_ROOT, line[3:].strip().lstrip("/"))
+    except Exception as e:
+        pass
+    return None
+
+
+def _write_cgroup_file(path, value):
+    with open(path, "w") as f:
+        f.write(value)
+
+
+def _read_cgroup_file(path):
+    with open(path, "r") as f:
+        return f.read().split()
+
+
+def _prepare_cgroup(logger):
+    # cgroup v2 only enables controllers for the children of a cgroup that
+    # holds no processes itself, so the core moves into a leaf cgroup first.
+    # The core's cgroup must be delegated to its user, e.g. a container or a
+    # systemd service with Delegate=yes.
+    base_cgroup = _get_own_cgroup()
+    if base_cgroup is None:
+        return None
+
+    if os.path.basename(base_cgroup) == CORE_CGROUP:
+        base_cgroup = os.path.dirname(base_cgroup)
+
+    subtree_control = os.path.join(base_cgroup, "cgroup.subtree_control")
+    try:
+        enabled = _read_cgroup_file(subtree_control)
+        if all(controller in enabled for controller in CGROUP_CONTROLLERS):
+            return base_cgroup
+
+        core_cgroup = os.path.join(base_cgroup, CORE_CGROUP)
+        os.makedirs(core_cgroup, exist_ok=True)
+        for pid in _read_cgroup_file(os.path.join(base_cgroup, "cgroup.procs")):
+            _write_cgroup_file(os.path.join(core_cgroup, "cgroup.procs"), pid)
+
+        _write_cgroup_file(
+            subtree_control,
+            " ".join(f"+{controller}" for controller in CGROUP_CONTROLLERS),
+        )
+        return base_cgroup
+    except OSError as e:
+        logger.warning(
+            f"<yellow>⚠️ Unable to set up cgroups in <cyan>{base_cgroup}</cyan>, it must be delegated to MCF (container or systemd Delegate=yes): {e}</yellow>"
+        )
+        return None
+
+
+def _get_cgroup_base(logger):
+    global cgroup_base, cgroup_checked
+    with cgroup_lock:
+        if not cgroup_checked:
+            cgroup_base = _prepare_cgroup(logger)
+            cgroup_checked = True
+        return cgroup_base
+
+
+def apply_cgroup(module, pid, limits, logger):
+    if not limits or not limits.get("cgroup"):
+        return False
+
+    if not os.path.exists(os.path.join(CGROUP_ROOT, "cgroup.controllers")):
+        logger.warning(
+            f"<yellow>⚠️ cgroup v2 is not available, <cyan>{module}</cyan> runs without a cgroup.</yellow>"
+        )
+        return False
+
+    base_cgroup = _get_cgroup_base(logger)
+    if base_cgroup is None:
+        return False
+
+    try:
+        module_cgroup = os.path.join(base_cgroup, f"mcf_{module}")
+        os.makedirs(module_cgroup, exist_ok=True)
+
+        max_memory = _get_limit(limits, "max_memory_mb")
+        if max_memory is not None:
+            _write_cgroup_file(
+                os.path.join(module_cgroup, "memory.max"),
+                str(max_memory * 1024 * 1024),
+            )
+
+        cpu_quota = _get_limit(limits, "cpu_quota_percent")
+        if cpu_quota is not None:
+            _write_cgroup_file(
+                os.path.join(module_cgroup, "cpu.max"), f"{cpu_quota * 1000} 100000"
+            )
+
+        _write_cgroup_file(os.path.join(module_cgroup, "cgroup.procs"), str(pid))
+        return True
+    except Exception as e:
+        logger.warning(
+            f"<yellow>⚠️ Unable to move <cyan>{module}</cyan> into a cgroup: {e}</yellow>"
+        )
+        return False
+
+
+def remove_cgroup(module):
+    # Fails while processes are left in it, e.g. a restart already moved in.
+    with cgroup_lock:
+        base_cgroup = cgroup_base
+    if base_cgroup is None:
+        return
+
+    try:
+        os.rmdir(os.path.join(base_cgroup, f"mcf_{module}"))
+    except OSError:
+        pass
@@ -0,0 +1,175 @@
+# Developed by: MasterkinG32
+# Date: 2024
+# Github: https://github.com/masterking32
+# Telegram: https://t.me/MasterCryptoFarmBot
+
+import collections
+import os
+import queue
+import selectors
+import sys
+import threading
+
+# Output without a newline (progress bars) is cut into lines of this size.
+MAX_LINE_SIZE = 65536
+
+
+class ModuleOutput:
+    def __init__(self, max_lines=500, echo=False):
+        self.max_lines = max(int(max_lines), 1)
+        self.echo = echo
+        self.lock = threading.Lock()
+        self.buffers = {}
+        self.pending_streams = queue.Queue()
+        self.selector = None
+        self.wakeup_reader = None
+        self.wakeup_writer = None
+        self.thread = None
+
+    def attach(self, module, stream):
+        if os.name == "nt":
+            # Windows pipes can not be used with select(), read them in a thread.
+            threading.Thread(
+                target=self._read_stream, args=(module, stream), daemon=True
+            ).start()
+            return
+
+        self._start_reader()
+        self.pending_streams.put((module, stream))
+        os.write(self.wakeup_writer, b"\0")
+
+    def get_lines(self, module, limit=None):
+        with self.lock:
+            lines = list(self.buffers.get(module, []))
+        if limit is not None:
+            return lines[-limit:]
+        return lines
+
+    def _start_reader(self):
+        with self.lock:
+            if self.thread is not None:
+                return
+
+            self.selector = selectors.DefaultSelector()
+            self.wakeup_reader, self.wakeup_writer = os.pipe()
+            os.set_blocking(self.wakeup_reader, False)
+            self.selector.register(self.wakeup_reader, selectors.EVENT_READ, None)
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        # One thread drains every module, if it died their pipes would fill up
+        # and the modules would block on write.
+        while True:
+            try:
+                events = self.selector.select()
+            except Exception as e:
+                self._drop_closed_streams()
+                continue
+
+            for key, _ in events:
+                try:
+                    self._handle_event(key)
+                except Exception as e:
+                    if key.data is not None:
+                        self._close_stream(key)
+
+    def _handle_event(self, key):
+        if key.data is None:
+            self._register_pending_streams()
+            return
+
+        module, stream, partial = key.data
+        try:
+            data = os.read(key.fd, 65536)
+        except OSError:
+            data = b""
+
+        if not data:
+            self._close_stream(key)
+            return
+
+        self._add_data(module, partial, data)
+
+    def _close_stream(self, key):
+        module, stream, partial = key.data
+        try:
+            self.selector.unregister(key.fileobj)
+        except (KeyError, ValueError):
+            pass
+        try:
+            stream.close()
+        except Exception as e:
+            pass
+        if partial:
+            self._add_line(module, bytes(partial))
+            partial.clear()
+
+    def _drop_closed_streams(self):
+        for key in list(self.selector.get_map().values()):
+            if key.data is None:
+                continue
+            try:
+                os.fstat(key.fd)
+            except OSError:
+                self._close_stream(key)
+
+    def _register_pending_streams(self):
+        try:
+            os.read(self.wakeup_reader, 4096)
+        except BlockingIOError:
+            pass
+
+        while True:
+            try:
+                module, stream = self.pending_streams.get_nowait()
+            except queue.Empty:
+                return
+
+            try:
+                self.selector.register(
+                    stream, selectors.EVENT_READ, (module, stream, bytearray())
+                )
+            except KeyError:
+                # The fd number still belongs to a stream closed elsewhere, drop
+                # it without closing, the fd is the new stream's now.
+                stale = self.selector.unregister(stream.fileno())
+                if stale.data[2]:
+                    self._add_line(stale.data[0], bytes(stale.data[2]))
+                self.selector.register(
+                    stream, selectors.EVENT_READ, (module, stream, bytearray())
+                )
+
+    def _read_stream(self, module, stream):
+        try:
+            for line in iter(lambda: stream.readline(MAX_LINE_SIZE), b""):
+                self._add_line(module, line)
+        except Exception as e:
+            pass
+        finally:
+            stream.close()
+
+    def _add_data(self, module, partial, data):
+        partial.extend(data)
+        while True:
+            index = partial.find(b"\n")
+            if index == -1:
+                if len(partial) < MAX_LINE_SIZE:
+                    return
+                index = MAX_LINE_SIZE - 1
+
+            self._add_line(module, bytes(partial[: index + 1]))
+            del partial[: index + 1]
+
+    def _add_line(self, module, line):
+        with self.lock:
+            if module not in self.buffers:
+                self.buffers[module] = collections.deque(maxlen=self.max_lines)
+            self.buffers[module].append(line.decode("utf-8", errors="replace"))
+
+        if self.echo:
+            try:
+                sys.stdout.buffer.write(line)
+                sys.stdout.flush()
+            except Exception as e:
+                pass
@@ -0,0 +1,129 @@
+# Developed by: MasterkinG32
+# Date: 2024
+# Github: https://github.com/masterking32
+# Telegram: https://t.me/MasterCryptoFarmBot
+
+import datetime
+import threading
+import time
+import psutil
+
+LIVENESS_MAX_AGE = 5
+
+
+class ModuleProcess:
+    __slots__ = (
+        "module",
+        "pid",
+        "process",
+        "command",
+        "start_time",
+        "restart_count",
+        "is_running",
+        "ps_process",
+        "limits",
+    )
+
+    def __init__(self, module, process, command=None, restart_count=0, limits=None):
+        self.module = module
+        self.pid = process.pid
+        self.process = process
+        self.command = command
+        self.start_time = datetime.datetime.now().replace(microsecond=0)
+        self.restart_count = restart_count
+        self.is_running = True
+        self.limits = limits or {}
+
+        try:
+            self.ps_process = psutil.Process(self.pid)
+        except psutil.Error:
+            self.ps_process = None
+            self.is_running = False
+
+    def check_running(self):
+        if self.ps_process is None or self.process.returncode is not None:
+            return False
+
+        try:
+            # is_running() compares the create time, so a reused PID is not alive.
+            return (
+                self.ps_process.is_running()
+                and self.ps_process.status() != psutil.STATUS_ZOMBIE
+            )
+        except psutil.Error:
+            return False
+
+
+class ModuleRegistry:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.records = {}
+        self.start_counts = {}
+        self.liveness_lock = threading.Lock()
+        self.liveness = {}
+        self.liveness_time = 0
+
+    def add(self, module, process, command=None, limits=None):
+        with self.lock:
+            start_count = self.start_counts.get(module, 0)
+            self.start_counts[module] = start_count + 1
+            record = ModuleProcess(module, process, command, start_count, limits)
+            self.records[module] = record
+            return record
+
+    def get(self, module):
+        with self.lock:
+            return self.records.get(module)
+
+    def remove(self, module, process=None):
+        with self.lock:
+            record = self.records.get(module)
+            if record is None:
+                return None
+
+            if process is not None and record.process is not process:
+                return None
+
+            del self.records[module]
+            return record
+
+    def mark_exited(self, module, process):
+        with self.lock:
+            record = self.records.get(module)
+            if record is not None and record.process is process:
+                record.is_running = False
+
+    def refresh_liveness(self, max_age=0):
+        # Snapshot before liveness_lock, callers may hold self.lock already and
+        # the two locks must always be taken in that order.
+        records = self.snapshot()
+        with self.liveness_lock:
+            if time.time() - self.liveness_time < max_age:
+                return self.liveness
+
+            liveness = {}
+            for record in records:
+                if record.is_running:
+                    record.is_running = record.check_running()
+                liveness[record.module] = record.is_running
+
+            self.liveness = liveness
+            self.liveness_time = time.time()
+            return liveness
+
+    def is_running(self, module, max_age=LIVENESS_MAX_AGE):
+        self.refresh_liveness(max_age)
+        record = self.get(module)
+        return record is not None and record.is_running
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.records.values())
+
+    def __contains__(self, module):
+        with self.lock:
+            return module in self.records
+
+    def __len__(self):
+        with self.lock:
+            return len(self.records)
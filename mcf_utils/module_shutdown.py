@@ -0,0 +1,104 @@
+# Developed by: MasterkinG32
+# Date: 2024
+# Github: https://github.com/masterking32
+# Telegram: https://t.me/MasterCryptoFarmBot
+
+import asyncio
+import signal
+import sys
+import threading
+import time
+
+shutdown_event = threading.Event()
+loops_lock = threading.Lock()
+running_loops = set()
+loop_cleanups = []
+
+
+def install(log=None):
+    # Called from the module's main thread, MCF sends SIGTERM before SIGKILL.
+    def handler(signum, frame):
+        if log is not None and not shutdown_event.is_set():
+            log.info("<y>🛑 Stop requested, finishing running tasks ...</y>")
+        request_shutdown()
+
+    try:
+        signal.signal(signal.SIGTERM, handler)
+    except (ValueError, OSError):
+        pass
+
+
+def is_shutting_down():
+    return shutdown_event.is_set()
+
+
+def request_shutdown():
+    shutdown_event.set()
+    with loops_lock:
+        loops = list(running_loops)
+
+    for loop in loops:
+        try:
+            loop.call_soon_threadsafe(_cancel_tasks, loop)
+        except RuntimeError:
+            # The loop is already closed.
+            pass
+
+
+def add_loop_cleanup(cleanup):
+    # Coroutine functions awaited before a loop started with run() closes.
+    if cleanup not in loop_cleanups:
+        loop_cleanups.append(cleanup)
+
+
+async def _run_loop_cleanups():
+    for cleanup in list(loop_cleanups):
+        try:
+            await cleanup()
+        except Exception as e:
+            pass
+
+
+def _cancel_tasks(loop):
+    for task in asyncio.all_tasks(loop):
+        task.cancel()
+
+
+def run(coroutine):
+    # asyncio.run() for module threads, the loop is cancelled on shutdown so
+    # finally blocks (session disconnects) still run.
+    async def runner():
+        loop = asyncio.get_running_loop()
+        with loops_lock:
+            running_loops.add(loop)
+        try:
+            if shutdown_event.is_set():
+                coroutine.close()
+                return None
+            return await coroutine
+        except asyncio.CancelledError:
+            if not shutdown_event.is_set():
+                raise
+            return None
+        finally:
+            with loops_lock:
+                running_loops.discard(loop)
+            await _run_loop_cleanups()
+
+    return asyncio.run(runner())
+
+
+def wait(timeout=None):
+    # Wait for the other module threads to leave their loops before exiting.
+    end_time = None if timeout is None else time.time() + timeout
+    while end_time is None or time.time() < end_time:
+        with loops_lock:
+            if not running_loops:
+                break
+        time.sleep(0.1)
+
+    try:
+        sys.stdout.flush()
+        sys.stderr.flush()
+    except Exception as e:
+        pass
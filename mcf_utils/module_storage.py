@@ -0,0 +1,319 @@
+# Developed by: MasterkinG32
+# Date: 2024
+# Github: https://github.com/masterking32
+# Telegram: https://t.me/MasterCryptoFarmBot
+
+import json
+import os
+import tempfile
+
+from mcf_utils.database import Database
+import mcf_utils.status_board as status_board
+
+MODULES_DIR = "modules"
+ACCOUNTS_FILE = "accounts.json"
+DISABLED_SESSIONS_FILE = "disabled_sessions.json"
+SETTINGS_FILE = "bot_settings.json"
+TOKENS_FILE = "tokens.json"
+DISPLAY_DATA_PREFIX = "display_data"
+
+
+class ModuleStorage:
+    def __init__(self, db_name, logger):
+        self.logger = logger
+        self.db = Database(db_name, logger)
+
+    def import_modules(self, modules):
+        # Called at startup and by the storage sync thread, the read methods
+        # below never write, so panel requests do not compete for the lock.
+        for module in modules:
+            try:
+                self._sync(module, ACCOUNTS_FILE)
+                self._sync(module, DISABLED_SESSIONS_FILE)
+                self._sync(module, SETTINGS_FILE)
+                self._sync(module, TOKENS_FILE)
+                for category in self._get_display_categories(module):
+                    self._sync(module, f"{category}.json")
+            except Exception as e:
+                self.logger.error(
+                    f"<red>❌ Module storage import ({module}): {e}</red>"
+                )
+
+    def get_accounts(self, module):
+        accounts = []
+        for data, disabled in (
+            self.db.query(
+                "SELECT data, disabled FROM module_accounts WHERE module = ? ORDER BY position",
+                (module,),
+            )
+            or []
+        ):
+            account = json.loads(data)
+            account["disabled"] = bool(disabled)
+            accounts.append(account)
+        return accounts
+
+    def save_account(self, module, account):
+        self._sync(module, ACCOUNTS_FILE)
+        with self.db.transaction() as conn:
+            row = conn.execute(
+                "SELECT position FROM module_accounts WHERE module = ? AND session_name = ?",
+                (module, account["session_name"]),
+            ).fetchone()
+            if row is None:
+                row = conn.execute(
+                    "SELECT COALESCE(MAX(position) + 1, 0) FROM module_accounts WHERE module = ?",
+                    (module,),
+                ).fetchone()
+
+            conn.execute(
+                "INSERT OR REPLACE INTO module_accounts (module, session_name, position, disabled, data) VALUES (?, ?, ?, ?, ?)",
+                (
+                    module,
+                    account["session_name"],
+                    row[0],
+                    1 if account.get("disabled") else 0,
+                    json.dumps(account),
+                ),
+            )
+        self._mirror(module, ACCOUNTS_FILE, self.get_accounts(module))
+
+    def set_account_disabled(self, module, session_name, disabled):
+        self._sync(module, ACCOUNTS_FILE)
+        with self.db.transaction() as conn:
+            conn.execute(
+                "UPDATE module_accounts SET disabled = ? WHERE module = ? AND session_name = ?",
+                (1 if disabled else 0, module, session_name),
+            )
+        self._mirror(module, ACCOUNTS_FILE, self.get_accounts(module))
+
+    def delete_account(self, module, session_name):
+        self._sync(module, ACCOUNTS_FILE)
+        with self.db.transaction() as conn:
+            conn.execute(
+                "DELETE FROM module_accounts WHERE module = ? AND session_name = ?",
+                (module, session_name),
+            )
+        self._mirror(module, ACCOUNTS_FILE, self.get_accounts(module))
+
+    def get_disabled_sessions(self, module):
+        return [
+            row[0]
+            for row in self.db.query(
+                "SELECT session_name FROM module_sessions WHERE module = ? AND disabled = 1",
+                (module,),
+            )
+            or []
+        ]
+
+    def set_disabled_sessions(self, module, sessions):
+        with self.db.transaction() as conn:
+            self._import_sessions(conn, module, sessions)
+        self._mirror(module, DISABLED_SESSIONS_FILE, self.get_disabled_sessions(module))
+
+    def get_settings(self, module):
+        return {
+            key: json.loads(value)
+            for key, value in self.db.query(
+                "SELECT key, value FROM module_settings WHERE module = ? ORDER BY position",
+                (module,),
+            )
+            or []
+        }
+
+    def update_settings(self, module, settings):
+        self._sync(module, SETTINGS_FILE)
+        with self.db.transaction() as conn:
+            row = conn.execute(
+                "SELECT COALESCE(MAX(position) + 1, 0) FROM module_settings WHERE module = ?",
+                (module,),
+            ).fetchone()
+            position = row[0]
+            for key, value in settings.items():
+                # Keep the position of existing keys, new keys go last.
+                updated = conn.execute(
+                    "UPDATE module_settings SET value = ? WHERE module = ? AND key = ?",
+                    (json.dumps(value), module, key),
+                ).rowcount
+                if not updated:
+                    conn.execute(
+                        "INSERT INTO module_settings (module, key, position, value) VALUES (?, ?, ?, ?)",
+                        (module, key, position, json.dumps(value)),
+                    )
+                    position += 1
+        self._mirror(module, SETTINGS_FILE, self.get_settings(module))
+
+    def get_display_data(self, module, category=DISPLAY_DATA_PREFIX, default=None):
+        # Modules with a status board publish their counters in shared memory.
+        data = status_board.read(self._get_module_dir(module), category)
+        if data is not None:
+            return data
+
+        rows = self.db.query(
+            "SELECT key, value FROM display_metrics WHERE module = ? AND category = ? ORDER BY position",
+            (module, category),
+        )
+        if not rows:
+            return {} if default is None else default
+
+        if self.db.getModuleState(module).get(f"list:{category}", False):
+            return [json.loads(value) for _, value in rows]
+        return {key: json.loads(value) for key, value in rows}
+
+    def _get_module_dir(self, module):
+        return os.path.join(MODULES_DIR, module)
+
+    def _get_display_categories(self, module):
+        module_dir = self._get_module_dir(module)
+        if not os.path.isdir(module_dir):
+            return []
+
+        categories = set(
+            file_name[:-5]
+            for file_name in os.listdir(module_dir)
+            if file_name.startswith(DISPLAY_DATA_PREFIX) and file_name.endswith(".json")
+        )
+        # Imported files the module deleted since, so their rows are dropped.
+        for key in self.db.getModuleState(module):
+            if key.startswith(f"file:{DISPLAY_DATA_PREFIX}"):
+                categories.add(key[5:-5])
+        return sorted(categories)
+
+    def _get_file_stat(self, path):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return [stat.st_mtime_ns, stat.st_size]
+
+    def _sync(self, module, file_name):
+        # Import a JSON file again only when the module changed it, a stat() is
+        # enough to find out.
+        path = os.path.join(self._get_module_dir(module), file_name)
+        file_stat = self._get_file_stat(path)
+        namespace = f"module:{module}"
+        imported_stat = self.db.getModuleState(module).get(f"file:{file_name}")
+        if imported_stat == file_stat:
+            return
+
+        data = None
+        if file_stat is not None:
+            try:
+                with open(path, "r") as f:
+                    data = json.load(f)
+            except Exception as e:
+                # The module may be writing the file, try again next time.
+                return
+
+        with self.db.transaction() as conn:
+            if file_name == ACCOUNTS_FILE:
+                self._import_accounts(conn, module, data or [])
+            elif file_name == DISABLED_SESSIONS_FILE:
+                self._import_sessions(conn, module, data or [])
+            elif file_name == SETTINGS_FILE:
+                self._import_settings(conn, module, data or {})
+            elif file_name == TOKENS_FILE:
+                self._import_tokens(conn, module, data or {})
+            elif file_name.startswith(DISPLAY_DATA_PREFIX):
+                self._import_display_data(conn, module, file_name[:-5], data)
+
+            if file_stat is None:
+                # The module deleted the file, its rows were dropped above.
+                self.db.deleteValue(namespace, f"file:{file_name}")
+            else:
+                self.db.setValue(namespace, f"file:{file_name}", file_stat)
+
+    def _import_accounts(self, conn, module, accounts):
+        conn.execute("DELETE FROM module_accounts WHERE module = ?", (module,))
+        conn.executemany(
+            "INSERT OR REPLACE INTO module_accounts (module, session_name, position, disabled, data) VALUES (?, ?, ?, ?, ?)",
+            [
+                (
+                    module,
+                    account.get("session_name") or str(position),
+                    position,
+                    1 if account.get("disabled") else 0,
+                    json.dumps(account),
+                )
+                for position, account in enumerate(accounts)
+            ],
+        )
+
+    def _import_sessions(self, conn, module, sessions):
+        conn.execute("DELETE FROM module_sessions WHERE module = ?", (module,))
+        conn.executemany(
+            "INSERT OR REPLACE INTO module_sessions (module, session_name) VALUES (?, ?)",
+            [(module, session_name) for session_name in sessions],
+        )
+
+    def _import_settings(self, conn, module, settings):
+        conn.execute("DELETE FROM module_settings WHERE module = ?", (module,))
+        conn.executemany(
+            "INSERT INTO module_settings (module, key, position, value) VALUES (?, ?, ?, ?)",
+            [
+                (module, key, position, json.dumps(value))
+                for position, (key, value) in enumerate(settings.items())
+            ],
+        )
+
+    def _import_tokens(self, conn, module, tokens):
+        conn.execute("DELETE FROM module_tokens WHERE module = ?", (module,))
+        conn.executemany(
+            "INSERT INTO module_tokens (module, session_name, token) VALUES (?, ?, ?)",
+            [
+                (module, session_name, json.dumps(token))
+                for session_name, token in tokens.items()
+            ],
+        )
+
+    def _import_display_data(self, conn, module, category, data):
+        conn.execute(
+            "DELETE FROM display_metrics WHERE module = ? AND category = ?",
+            (module, category),
+        )
+
+        is_list = isinstance(data, list)
+        if is_list:
+            items = [(str(position), value) for position, value in enumerate(data)]
+        elif isinstance(data, dict):
+            items = list(data.items())
+        else:
+            items = []
+
+        conn.executemany(
+            "INSERT INTO display_metrics (module, category, key, position, value) VALUES (?, ?, ?, ?, ?)",
+            [
+                (module, category, key, position, json.dumps(value))
+                for position, (key, value) in enumerate(items)
+            ],
+        )
+        self.db.setValue(f"module:{module}", f"list:{category}", is_list)
+
+    def _mirror(self, module, file_name, data):
+        # Stopgap for modules that still read their JSON files: the whole file
+        # is rewritten atomically after each change. Once modules read the
+        # tables, this goes and an update touches only its row.
+        module_dir = self._get_module_dir(module)
+        path = os.path.join(module_dir, file_name)
+        try:
+            mode = os.stat(path).st_mode & 0o777
+        except OSError:
+            mode = 0o644
+
+        fd, tmp_path = tempfile.mkstemp(dir=module_dir, suffix=".tmp")
+        try:
+            os.chmod(tmp_path, mode)
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f, indent=4)
+                f.flush()
+                file_stat = os.fstat(f.fileno())
+            os.replace(tmp_path, path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+        self.db.setValue(
+            f"module:{module}",
+            f"file:{file_name}",
+            [file_stat.st_mtime_ns, file_stat.st_size],
+        )
@@ -0,0 +1,105 @@
+# Developed by: MasterkinG32
+# Date: 2024
+# Github: https://github.com/masterking32
+# Telegram: https://t.me/MasterCryptoFarmBot
+
+import collections
+import threading
+import time
+import psutil
+
+
+class ModuleTelemetry:
+    def __init__(self, max_samples=120):
+        self.max_samples = max(int(max_samples), 1)
+        self.lock = threading.Lock()
+        self.samples = {}
+        self.process_handles = {}
+
+    def collect(self, records):
+        seen_pids = set()
+        for record in records:
+            if not record.is_running or record.ps_process is None:
+                continue
+
+            try:
+                processes = [record.ps_process] + record.ps_process.children(
+                    recursive=True
+                )
+            except psutil.Error:
+                continue
+
+            sample = {
+                "time": int(time.time()),
+                "processes": 0,
+                "cpu_percent": 0.0,
+                "rss": 0,
+                "threads": 0,
+                "open_files": 0,
+                "read_bytes": 0,
+                "write_bytes": 0,
+            }
+
+            for process in processes:
+                process = self._get_process_handle(process)
+                seen_pids.add(process.pid)
+                try:
+                    with process.oneshot():
+                        sample["cpu_percent"] += process.cpu_percent(interval=None)
+                        sample["rss"] += process.memory_info().rss
+                        sample["threads"] += process.num_threads()
+                        sample["open_files"] += self._get_open_files(process)
+                        io_counters = self._get_io_counters(process)
+                        if io_counters is not None:
+                            sample["read_bytes"] += io_counters.read_bytes
+                            sample["write_bytes"] += io_counters.write_bytes
+                    sample["processes"] += 1
+                except psutil.Error:
+                    continue
+
+            sample["cpu_percent"] = round(sample["cpu_percent"], 1)
+            with self.lock:
+                if record.module not in self.samples:
+                    self.samples[record.module] = collections.deque(
+                        maxlen=self.max_samples
+                    )
+                self.samples[record.module].append(sample)
+
+        for pid in list(self.process_handles):
+            if pid not in seen_pids:
+                del self.process_handles[pid]
+
+    def _get_process_handle(self, process):
+        # cpu_percent() measures against the previous call on the same handle.
+        cached = self.process_handles.get(process.pid)
+        if cached is not None and cached.create_time() == process.create_time():
+            return cached
+
+        self.process_handles[process.pid] = process
+        return process
+
+    def _get_open_files(self, process):
+        try:
+            if hasattr(process, "num_fds"):
+                return process.num_fds()
+            return process.num_handles()
+        except (psutil.Error, AttributeError):
+            return 0
+
+    def _get_io_counters(self, process):
+        try:
+            return process.io_counters()
+        except (psutil.Error, AttributeError):
+            return None
+
+    def get_samples(self, module):
+        with self.lock:
+            return list(self.samples.get(module, []))
+
+    def get_latest(self):
+        with self.lock:
+            return {
+                module: samples[-1]
+                for module, samples in self.samples.items()
+                if samples
+            }
@@ -21,7 +21,7 @@ class Module:
         return os.path.basename(os.getcwd())
 
     def is_module_disabled(self, db, module_name):
-        return db.getSettings(f"{module_name}_disabled", "0") == "1"
+        return db.isModuleDisabled(module_name)
 
     def load_modules(self, noLog=False):
         if not noLog:
@@ -105,7 +105,7 @@ class Module:
 
         try:
             git = Git.Git(self.logger, None)
-            current_commit_hash = git.GetRecentLocalCommit(f"modules/{module}")
+            current_commit_hash = git.ReadLocalCommit(f"modules/{module}")
             return current_commit_hash != new_commit_hash
         except Exception as e:
             self.logger.error(f"Error: {e}")
@@ -3,10 +3,13 @@
 # Github: https://github.com/masterking32
 # Telegram: https://t.me/MasterCryptoFarmBot
 
+import concurrent.futures
 import datetime
 import os
+import queue
 import random
 import sys
+import threading
 import time
 import subprocess
 import psutil
@@ -15,7 +18,14 @@ import mcf_utils.Git as Git
 import mcf_utils.utils as utils
 import mcf_utils.api as api
 import mcf_utils.database as database
+import mcf_utils.module_limits as module_limits
 from mcf_utils.modules import Module
+from mcf_utils.module_registry import LIVENESS_MAX_AGE, ModuleRegistry
+from mcf_utils.module_telemetry import ModuleTelemetry
+from mcf_utils.module_output import ModuleOutput
+from mcf_utils.module_launcher import ModuleLauncher
+from mcf_utils.module_ipc import IPC_FD_ENV, ModuleIPC
+from mcf_utils.module_storage import ModuleStorage
 import config
 
 
@@ -32,46 +42,99 @@ class Module_Thread:
         "/usr/bin/python",
         "/bin/python",
     ]
-    running_modules = []
 
     def __init__(self, logger):
         self.logger = logger
         self.api = api.API(self.logger)
-        self.running_modules = []
+        self.running_modules = ModuleRegistry()
         self.stopped_by_user = []
+        self.module_exits = queue.Queue()
+        self.supervisor_event = threading.Event()
+        self.restart_attempts = {}
+        self.next_restart_time = {}
+        self.modules_dir_mtime = None
+        self.modules_dir_cache = []
+        self.shutting_down = False
+        self.updating_modules = set()
+        self.starting_modules = set()
+        self.migration_lock = threading.Lock()
+        self.telemetry = ModuleTelemetry(
+            utils.getConfig(config.config, "module_telemetry_samples", 120)
+        )
+        self.module_output = ModuleOutput(
+            utils.getConfig(config.config, "module_output_lines", 500),
+            utils.getConfig(config.config, "display_module_logs_in_console", False),
+        )
+        self.module_launcher = self._get_module_launcher()
+        self.module_ipc = ModuleIPC(self.logger) if ModuleIPC.is_supported() else None
+
+    def _get_module_launcher(self):
+        launcher = utils.getConfig(config.config, "module_launcher", "subprocess")
+        if launcher != "forkserver":
+            return None
+
+        if not ModuleLauncher.is_supported():
+            self.logger.warning(
+                "<yellow>⚠️ Fork server launcher is not supported on this system, using subprocess.</yellow>"
+            )
+            return None
+
+        return ModuleLauncher(self.logger)
 
     def get_modules(self, update=False):
         if not os.path.exists(self.MODULES_DIR):
             return []
 
-        modules = os.listdir(self.MODULES_DIR)
+        modules = self._list_modules()
         db = database.Database("database.db", self.logger)
         license = db.getSettings("license", self.DEFAULT_LICENSE)
 
         license_modules = self._fetch_license_modules(license, update)
+        module_states = db.getModuleStates()
         modules_output = []
 
         for module in modules:
-            module_path = os.path.join(self.MODULES_DIR, module)
-            if not os.path.isdir(module_path) or not os.path.exists(
-                os.path.join(module_path, self.BOT_FILE)
-            ):
-                continue
-
-            new_module = self._initialize_module(db, module, license_modules)
-            if new_module["disabled"]:
-                modules_output.append(new_module)
-                continue
+            new_module = self._initialize_module(module, module_states, license_modules)
+            modules_output.append(new_module)
 
+        if update:
             try:
-                self._update_module_if_required(new_module, module, update, db)
+                self._update_modules(
+                    [module for module in modules_output if not module["disabled"]],
+                    db,
+                )
             except Exception as e:
                 self.logger.error(f"Modules Thread: {e}")
 
-            modules_output.append(new_module)
-
         return modules_output
 
+    def _list_modules(self):
+        try:
+            modules_dir_mtime = os.stat(self.MODULES_DIR).st_mtime_ns
+        except OSError:
+            return []
+
+        if modules_dir_mtime == self.modules_dir_mtime:
+            return self.modules_dir_cache
+
+        modules = []
+        incomplete_module = False
+        for module in os.listdir(self.MODULES_DIR):
+            module_path = os.path.join(self.MODULES_DIR, module)
+            if not os.path.isdir(module_path):
+                continue
+
+            if not os.path.exists(os.path.join(module_path, self.BOT_FILE)):
+                # The module may still be cloning, so scan again next time.
+                incomplete_module = True
+                continue
+
+            modules.append(module)
+
+        self.modules_dir_mtime = None if incomplete_module else modules_dir_mtime
+        self.modules_dir_cache = modules
+        return modules
+
     def _fetch_license_modules(self, license, update):
         if license != self.DEFAULT_LICENSE and update:
             license_modules = self.api.get_user_modules(license)
@@ -80,12 +143,13 @@ class Module_Thread:
             return license_modules
         return []
 
-    def _initialize_module(self, db, module, license_modules):
+    def _initialize_module(self, module, module_states, license_modules):
         new_module = {
             "name": module,
             "commit_hash": None,
             "restart_required": False,
-            "disabled": db.getSettings(f"{module}_disabled", "0") == "1",
+            "disabled": module_states.get(module, {}).get("disabled", False) is True,
+            "priority": self._get_module_priority(module),
         }
 
         for l_module in license_modules:
@@ -97,22 +161,62 @@ class Module_Thread:
 
         return new_module
 
-    def _update_module_if_required(self, new_module, module, update, db):
-        if not update:
+    def _get_module_priority(self, module):
+        priorities = utils.getConfig(config.config, "module_priorities", {})
+        try:
+            return int(priorities.get(module, 0))
+        except (AttributeError, TypeError, ValueError):
+            return 0
+
+    def _update_modules(self, modules, db):
+        if not utils.getConfig(config.config, "auto_update_modules", True):
             return
 
-        git = Git.Git(self.logger, config.config)
         modules_class = Module(self.logger)
+        outdated_modules = [
+            module["name"]
+            for module in modules
+            if module["commit_hash"] is not None
+            and modules_class.UpdateRequired(module["name"], module["commit_hash"])
+        ]
+        if not outdated_modules:
+            return
+
+        workers = max(utils.getConfig(config.config, "update_check_workers", 4), 1)
+        self.logger.info(
+            f"<green>🔄 Updating <cyan>{len(outdated_modules)}</cyan> modules, <cyan>{workers}</cyan> at a time ...</green>"
+        )
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=min(workers, len(outdated_modules))
+        ) as executor:
+            futures = {
+                executor.submit(self._update_module, module, db): module
+                for module in outdated_modules
+            }
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    future.result()
+                except Exception as e:
+                    self.logger.error(f"UpdateModule ({futures[future]}): {e}")
+
+    def _update_module(self, module, db):
+        git = Git.Git(self.logger, config.config)
+        directory = os.path.join(os.getcwd(), self.MODULES_DIR, module)
 
-        if (
-            utils.getConfig(config.config, "auto_update_modules", True)
-            and new_module["commit_hash"] is not None
-            and modules_class.UpdateRequired(module, new_module["commit_hash"])
-        ):
+        # Download while the module keeps running, it is only down for the checkout.
+        git.FetchProject(directory)
+
+        self.updating_modules.add(module)
+        try:
             self.stop_module(module)
-            directory = os.path.join(os.getcwd(), f"{self.MODULES_DIR}/{module}")
             git.UpdateProject(directory, False)
-            db.migration_modules([module])
+            with self.migration_lock:
+                db.migration_modules([module])
+        finally:
+            self.updating_modules.discard(module)
+
+        if module not in self.stopped_by_user:
             self.run_module(module)
 
     def check_main_project_update(self):
@@ -158,6 +262,53 @@ class Module_Thread:
                 self.logger.error(f"UpdateCheckThread: {e}")
                 time.sleep(update_check_interval)
 
+    def telemetry_thread(self):
+        telemetry_interval = max(
+            utils.getConfig(config.config, "module_telemetry_interval", 30), 5
+        )
+
+        while True:
+            try:
+                self.running_modules.refresh_liveness(telemetry_interval)
+                self.telemetry.collect(self.running_modules.snapshot())
+                self._restart_modules_over_memory_limit()
+            except Exception as e:
+                self.logger.error(f"TelemetryThread: {e}")
+            time.sleep(telemetry_interval)
+
+    def storage_sync_thread(self):
+        # Imports module JSON files changed by the modules, off the panel's
+        # request path.
+        sync_interval = max(
+            utils.getConfig(config.config, "module_storage_sync_interval", 30), 5
+        )
+        module_storage = ModuleStorage("database.db", self.logger)
+
+        while True:
+            try:
+                module_storage.import_modules(self._list_modules())
+            except Exception as e:
+                self.logger.error(f"StorageSyncThread: {e}")
+            time.sleep(sync_interval)
+
+    def _restart_modules_over_memory_limit(self):
+        latest_samples = self.telemetry.get_latest()
+        for module_data in self.running_modules.snapshot():
+            soft_memory_limit = module_limits.get_soft_memory_limit(module_data.limits)
+            sample = latest_samples.get(module_data.module)
+            if (
+                soft_memory_limit is None
+                or sample is None
+                or sample["time"] < module_data.start_time.timestamp()
+                or sample["rss"] <= soft_memory_limit
+            ):
+                continue
+
+            self.logger.warning(
+                f"<yellow>⚠️ <cyan>{module_data.module}</cyan> module uses <cyan>{sample['rss'] // (1024 * 1024)}</cyan> MB, restarting ...</yellow>"
+            )
+            self.restart_module(module_data.module)
+
     def get_python_executable(self):
         try:
             python_executable = sys.executable
@@ -190,16 +341,39 @@ class Module_Thread:
         try:
             if process is None:
                 return
-            parent = psutil.Process(process.pid)
-            for child in parent.children(recursive=True):
-                child.kill()
-
-            parent.kill()
+            self._stop_processes(self._get_process_tree(psutil.Process(process.pid)))
         except psutil.NoSuchProcess:
             pass
         except Exception as e:
             pass
 
+    def _get_process_tree(self, process):
+        try:
+            return [process] + process.children(recursive=True)
+        except psutil.NoSuchProcess:
+            return []
+
+    def _stop_processes(self, processes):
+        # SIGTERM first so modules can disconnect their sessions, then SIGKILL.
+        grace_period = max(
+            utils.getConfig(config.config, "module_stop_grace_period", 10), 0
+        )
+        for process in processes:
+            try:
+                process.terminate()
+            except psutil.NoSuchProcess:
+                pass
+
+        _, alive = psutil.wait_procs(processes, timeout=grace_period)
+        for process in alive:
+            try:
+                self.logger.warning(
+                    f"<yellow>⚠️ Process with PID {process.pid} did not stop in <cyan>{grace_period}</cyan> seconds, killing it!</yellow>"
+                )
+                process.kill()
+            except psutil.NoSuchProcess:
+                pass
+
     def run_module(self, module, user_run=False):
         try:
             module_path = os.path.join(self.MODULES_DIR, module, self.BOT_FILE)
@@ -210,100 +384,211 @@ class Module_Thread:
             if user_run and module in self.stopped_by_user:
                 self.stopped_by_user.remove(module)
 
-            if self.is_module_running(module):
+            if module in self.updating_modules:
                 self.logger.warning(
-                    f"<yellow>🚀 {module} module is already running!</yellow>"
+                    f"<yellow>🔄 {module} module is updating, it will start after the update!</yellow>"
                 )
                 return
 
-            for rm in self.running_modules:
-                if rm["module"] == module:
-                    if "process" in rm:
-                        self.kill_process_tree(rm["process"])
+            # Reserve the module under the registry lock, the old process tree is
+            # stopped and the new one spawned outside of it, so a start batch
+            # spawns its modules in parallel.
+            self.running_modules.refresh_liveness(LIVENESS_MAX_AGE)
+            with self.running_modules.lock:
+                if self.shutting_down:
+                    return
+
+                record = self.running_modules.get(module)
+                if (
+                    record is not None and record.is_running
+                ) or module in self.starting_modules:
+                    self.logger.warning(
+                        f"<yellow>🚀 {module} module is already running!</yellow>"
+                    )
+                    return
+
+                self.starting_modules.add(module)
+                module_data = self.running_modules.remove(module)
 
-                    self.running_modules.remove(rm)
+            try:
+                if module_data is not None:
+                    self.kill_process_tree(module_data.process)
 
-            db = database.Database("database.db", self.logger)
-            if db.getSettings(f"{module}_disabled", "0") == "1":
-                self.logger.error(f"<red>❌ {module} module is disabled!</red>")
-                return
+                db = database.Database("database.db", self.logger)
+                if db.isModuleDisabled(module):
+                    self.logger.error(f"<red>❌ {module} module is disabled!</red>")
+                    return
 
-            self.logger.info(
-                f"<green>🚀 Running <cyan>{module}</cyan> module ...</green>"
-            )
-            python_executable = self.get_python_executable()
+                self.logger.info(
+                    f"<green>🚀 Running <cyan>{module}</cyan> module ...</green>"
+                )
+                python_executable = self.get_python_executable()
 
-            display_module_logs_in_console = utils.getConfig(
-                config.config, "display_module_logs_in_console", False
-            )
-            display_module_log_cmd = (
-                ""
-                if display_module_logs_in_console
-                else (" >nul 2>nul" if os.name == "nt" else " >/dev/null 2>&1")
-            )
+                main_pid = os.getpid()
+                exec_args = [python_executable, module_path, str(main_pid)]
+                limits = module_limits.load_module_limits(
+                    os.path.join(self.MODULES_DIR, module)
+                )
+                ipc_sock = None
+                if self.module_ipc is not None:
+                    ipc_sock = self.module_ipc.open(module)
 
-            if " " in python_executable:
-                python_executable = f'"{python_executable}"'
-
-            main_pid = os.getpid()
-            exec_command = f'{python_executable} "{module_path}" {main_pid}{display_module_log_cmd}'
-            process = subprocess.Popen(exec_command, shell=True)
-            self.running_modules.append(
-                {
-                    "module": module,
-                    "process": process,
-                    "command": exec_command,
-                    "is_running": True,
-                    "start_time": datetime.datetime.now().replace(microsecond=0),
-                }
-            )
+                try:
+                    if self.module_launcher is not None:
+                        process = self.module_launcher.launch(
+                            module_path, main_pid, limits, ipc_sock
+                        )
+                    else:
+                        process = subprocess.Popen(
+                            exec_args,
+                            stdin=subprocess.DEVNULL,
+                            stdout=subprocess.PIPE,
+                            stderr=subprocess.STDOUT,
+                            pass_fds=[ipc_sock.fileno()] if ipc_sock else [],
+                            env=self._get_module_env(ipc_sock),
+                        )
+                        module_limits.apply_limits_to_process(
+                            module, process.pid, limits, self.logger
+                        )
+                except Exception:
+                    if ipc_sock is not None:
+                        self.module_ipc.close(module)
+                    raise
+                finally:
+                    # The module has its own copy now.
+                    if ipc_sock is not None:
+                        ipc_sock.close()
+                self.module_output.attach(module, process.stdout)
+                module_limits.apply_cgroup(module, process.pid, limits, self.logger)
+                with self.running_modules.lock:
+                    # stop_all_modules() ran while the module was spawning.
+                    shutting_down = self.shutting_down
+                    if not shutting_down:
+                        self.running_modules.add(
+                            module, process, subprocess.list2cmdline(exec_args), limits
+                        )
+                if shutting_down:
+                    self.kill_process_tree(process)
+                    return
+            finally:
+                with self.running_modules.lock:
+                    self.starting_modules.discard(module)
+
+            self.next_restart_time.pop(module, None)
+            threading.Thread(
+                target=self._watch_module_process,
+                args=(module, process),
+                daemon=True,
+            ).start()
         except Exception as e:
             self.logger.error(f"RunModule: {e}")
 
+    def _get_module_env(self, ipc_sock):
+        if ipc_sock is None:
+            return None
+        return dict(os.environ, **{IPC_FD_ENV: str(ipc_sock.fileno())})
+
+    def send_module_command(self, module, command, **data):
+        if self.module_ipc is None or not self.is_module_running(module):
+            return False
+        return self.module_ipc.send_command(module, command, **data)
+
+    def get_module_ipc_status(self, module):
+        if self.module_ipc is None or not self.is_module_running(module):
+            return None
+        return self.module_ipc.get_status(module)
+
+    def _watch_module_process(self, module, process):
+        try:
+            process.wait()
+        except Exception as e:
+            pass
+
+        self.running_modules.mark_exited(module, process)
+        module_limits.remove_cgroup(module)
+        self.module_exits.put((module, process))
+        self.supervisor_event.set()
+
+    def _reap_exited_modules(self):
+        while True:
+            try:
+                module, process = self.module_exits.get_nowait()
+            except queue.Empty:
+                return
+
+            # Modules stopped through stop_module are already unregistered.
+            module_data = self.running_modules.remove(module, process)
+            if module_data is None:
+                continue
+
+            uptime = (datetime.datetime.now() - module_data.start_time).total_seconds()
+            self._schedule_module_restart(module, uptime, process.returncode)
+
+    def _schedule_module_restart(self, module, uptime, exit_code):
+        restart_delay = max(
+            utils.getConfig(config.config, "module_restart_delay", 10), 1
+        )
+        max_restart_delay = max(
+            utils.getConfig(config.config, "module_restart_max_delay", 600),
+            restart_delay,
+        )
+
+        if uptime >= max_restart_delay:
+            self.restart_attempts[module] = 0
+
+        attempts = self.restart_attempts.get(module, 0)
+        delay = min(restart_delay * (2 ** min(attempts, 16)), max_restart_delay)
+        self.restart_attempts[module] = attempts + 1
+        self.next_restart_time[module] = time.time() + delay
+
+        self.logger.warning(
+            f"<yellow>⚠️ <cyan>{module}</cyan> module exited with code <cyan>{exit_code}</cyan>, restarting in <cyan>{delay}</cyan> seconds ...</yellow>"
+        )
+
+    def _is_restart_due(self, module):
+        return time.time() >= self.next_restart_time.get(module, 0)
+
+    def _get_supervisor_timeout(self, check_interval, sync_time):
+        timeout = check_interval
+        for restart_time in list(self.next_restart_time.values()):
+            if restart_time > sync_time:
+                timeout = min(timeout, max(restart_time - time.time(), 0))
+        return timeout
+
     def get_module_start_time(self, module):
         try:
-            for rm in self.running_modules:
-                if rm["module"] == module:
-                    return rm["start_time"]
+            module_data = self.running_modules.get(module)
+            if module_data is not None:
+                return module_data.start_time
         except Exception as e:
             self.logger.error(f"GetModuleStartTime: {e}")
         return datetime.datetime.now().replace(microsecond=0)
 
     def stop_module(self, module, user_stop=False):
         try:
-            module_data = next(
-                (
-                    rm
-                    for rm in self.running_modules
-                    if rm["module"] == module and rm["is_running"]
-                ),
-                None,
-            )
-
             if user_stop and module not in self.stopped_by_user:
                 self.stopped_by_user.append(module)
 
             self.logger.info(f"<green>🚀 Stopping {module} module ...</green>")
+            module_data = self.running_modules.remove(module)
             if module_data is None:
                 # self.logger.info(f"<red>❌ {module} module not running!</red>")
                 return
 
             try:
-                process = psutil.Process(module_data["process"].pid)
-                for child in process.children(recursive=True):
-                    child.kill()
-                process.kill()
+                process = module_data.ps_process or psutil.Process(module_data.pid)
+                processes = self._get_process_tree(process)
             except psutil.NoSuchProcess:
+                processes = []
+
+            if not processes:
                 self.logger.warning(
-                    f"<yellow>⚠️ Process with PID {module_data['process'].pid} not found, it is already stopped!</yellow>"
+                    f"<yellow>⚠️ Process with PID {module_data.pid} not found, it is already stopped!</yellow>"
                 )
+                return
 
-            for rm in self.running_modules:
-                if rm["module"] == module:
-                    if "process" in rm:
-                        self.kill_process_tree(rm["process"])
+            self._stop_processes(processes)
 
-                    self.running_modules.remove(rm)
             self.logger.info(f"<green>🚀 {module} module stopped!</green>")
         except Exception as e:
             self.logger.error(f"StopModule: {e}")
@@ -316,7 +601,7 @@ class Module_Thread:
                 return
 
             db = database.Database("database.db", self.logger)
-            if db.getSettings(f"{module}_disabled", "0") == "1":
+            if db.isModuleDisabled(module):
                 return
 
             self.logger.info(f"<green>🚀 Restarting {module} module ...</green>")
@@ -330,38 +615,9 @@ class Module_Thread:
 
     def is_module_running(self, module):
         try:
-            for rm in self.running_modules:
-                if rm["module"] == module:
-                    process_data = rm
-                    if process_data is None or "process" not in process_data:
-                        return False
-
-                    isProcessRunning = False
-                    try:
-                        process = psutil.Process(process_data["process"].pid)
-                        if process.is_running():
-                            isProcessRunning = True
-                        else:
-                            isProcessRunning = False
-                    except psutil.NoSuchProcess:
-                        isProcessRunning = False
-                    except Exception as e:
-                        isProcessRunning = False
-
-                    process_data["is_running"] = isProcessRunning
-                    self.running_modules[self.running_modules.index(rm)] = process_data
-
-                    if not isProcessRunning:
-                        if "process" in rm:
-                            self.kill_process_tree(rm["process"])
-
-                        self.running_modules.remove(rm)
-
-                    return isProcessRunning
+            return self.running_modules.is_running(module)
         except Exception as e:
-            pass
-
-        return False
+            return False
 
     def run_all_modules(self):
         run_delay = utils.getConfig(config.config, "run_delay", 60)
@@ -375,11 +631,27 @@ class Module_Thread:
             f"<green>🚀 Python Executable for running modules: <y>{python_executable}</y></green>"
         )
 
+        check_interval = max(
+            utils.getConfig(config.config, "module_check_interval", 300), 10
+        )
+        first_run = True
         while True:
             try:
+                if self.shutting_down:
+                    time.sleep(1)
+                    continue
+
+                self.supervisor_event.clear()
+                self._reap_exited_modules()
+                self.running_modules.refresh_liveness()
+                sync_time = time.time()
                 modules = self.get_modules()
+                modules_to_start = []
                 for module in modules:
-                    if module["name"] in self.stopped_by_user:
+                    if (
+                        module["name"] in self.stopped_by_user
+                        or module["name"] in self.updating_modules
+                    ):
                         continue
 
                     if module["disabled"]:
@@ -392,30 +664,85 @@ class Module_Thread:
                         continue
 
                     if not self.is_module_running(module["name"]):
+                        if not self._is_restart_due(module["name"]):
+                            continue
+
+                        if first_run:
+                            modules_to_start.append(module)
+                            continue
+
                         self.run_module(module["name"])
                         self.logger.info(
                             f"<green>✅ <cyan>{len(self.running_modules)}</cyan> modules running!</green>"
                         )
-                        random_wait = random.randint(30, 60)
-
-                        self.logger.info(
-                            f"<green>🚀 Waiting for <cyan>{random_wait}</cyan> seconds before running the next module ...</green>"
-                        )
 
-                        time.sleep(random_wait)
+                if modules_to_start:
+                    self.start_modules(modules_to_start)
+                    self.logger.info(
+                        f"<green>✅ <cyan>{len(self.running_modules)}</cyan> modules running!</green>"
+                    )
 
-                time.sleep(300)
+                first_run = False
+                self.supervisor_event.wait(
+                    self._get_supervisor_timeout(check_interval, sync_time)
+                )
             except Exception as e:
                 self.logger.error(f"RunAllModules: {e}")
+                time.sleep(5)
+
+    def start_modules(self, modules):
+        concurrency = max(
+            utils.getConfig(config.config, "module_start_concurrency", 5), 1
+        )
+        jitter = max(utils.getConfig(config.config, "module_start_jitter", 10), 0)
+
+        modules = sorted(modules, key=lambda module: module["priority"], reverse=True)
+        self.logger.info(
+            f"<green>🚀 Starting <cyan>{len(modules)}</cyan> modules, <cyan>{concurrency}</cyan> at a time ...</green>"
+        )
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for i in range(0, len(modules), concurrency):
+                if self.shutting_down:
+                    return
+
+                batch = [module["name"] for module in modules[i : i + concurrency]]
+                delays = sorted(random.uniform(0, jitter) for _ in batch)
+                futures = [
+                    executor.submit(self._run_module_delayed, module, delay)
+                    for module, delay in zip(batch, delays)
+                ]
+                concurrent.futures.wait(futures)
+
+    def _run_module_delayed(self, module, delay):
+        time.sleep(delay)
+        if self.shutting_down:
+            return
+        self.run_module(module)
 
     def stop_all_modules(self):
         self.logger.info("<green>🚀 Stopping all modules ...</green>")
-        for rm in self.running_modules:
-            if "module" in rm:
-                try:
-                    self.stop_module(rm["module"])
-                except Exception as e:
-                    pass
+        # Under the registry lock, a module is either in the snapshot below or
+        # run_module sees the flag and does not register it.
+        with self.running_modules.lock:
+            self.shutting_down = True
+
+        # Stop every module at once, so the grace period is only waited for once.
+        processes = []
+        for module_data in self.running_modules.snapshot():
+            if self.running_modules.remove(module_data.module) is None:
+                continue
+
+            try:
+                process = module_data.ps_process or psutil.Process(module_data.pid)
+                processes.extend(self._get_process_tree(process))
+            except psutil.NoSuchProcess:
+                pass
+
+        try:
+            self._stop_processes(processes)
+        except Exception as e:
+            pass
 
     def __del__(self):
         self.stop_all_modules()
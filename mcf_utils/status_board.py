@@ -0,0 +1,295 @@
+# Developed by: MasterkinG32
+# Date: 2024
+# Github: https://github.com/masterking32
+# Telegram: https://t.me/MasterCryptoFarmBot
+
+import mmap
+import os
+import struct
+import threading
+import time
+
+BOARD_FILE = ".status_board"
+MAGIC = b"MCFB"
+VERSION = 1
+MAX_CATEGORIES = 8
+MAX_METRICS = 64
+MAX_ACCOUNTS = 1024
+READ_RETRIES = 100
+
+CATEGORY_DICT = 1
+CATEGORY_ACCOUNTS = 2
+
+# Fixed layout: header, category table, metric slots, account slots.
+HEADER = struct.Struct("<4sIQd")
+CATEGORY = struct.Struct("<48sB7x")
+METRIC = struct.Struct("<B7x48s96sq")
+ACCOUNT = struct.Struct("<64sB7x")
+SEQUENCE = struct.Struct("<Q")
+SEQUENCE_OFFSET = 8
+
+CATEGORIES_OFFSET = HEADER.size
+METRICS_OFFSET = CATEGORIES_OFFSET + CATEGORY.size * MAX_CATEGORIES
+ACCOUNTS_OFFSET = METRICS_OFFSET + METRIC.size * MAX_METRICS
+BOARD_SIZE = ACCOUNTS_OFFSET + ACCOUNT.size * MAX_ACCOUNTS
+FREE_SLOT = 0xFF
+
+
+def _encode(text, size):
+    return str(text).encode("utf-8")[:size]
+
+
+def _decode(data):
+    return data.rstrip(b"\x00").decode("utf-8", errors="ignore")
+
+
+def _get_category_name(file_name):
+    return file_name[:-5] if file_name.endswith(".json") else file_name
+
+
+class StatusBoard:
+    # Written by the module process only, the panel reads it with read().
+    def __init__(self, module_dir):
+        self.path = os.path.join(module_dir, BOARD_FILE)
+        self.lock = threading.Lock()
+        self.categories = {}
+        self.metrics = {}
+        self.accounts = {}
+
+        with open(self.path, "a+b") as f:
+            if os.fstat(f.fileno()).st_size != BOARD_SIZE:
+                f.truncate(BOARD_SIZE)
+            self.mm = mmap.mmap(f.fileno(), BOARD_SIZE)
+
+        with self._write():
+            self.mm[SEQUENCE_OFFSET + SEQUENCE.size : BOARD_SIZE] = bytes(
+                BOARD_SIZE - SEQUENCE_OFFSET - SEQUENCE.size
+            )
+            self.mm[:SEQUENCE_OFFSET] = MAGIC + struct.pack("<I", VERSION)
+            for index in range(MAX_METRICS):
+                METRIC.pack_into(
+                    self.mm,
+                    METRICS_OFFSET + index * METRIC.size,
+                    FREE_SLOT,
+                    b"",
+                    b"",
+                    0,
+                )
+
+    def update_display_data(self, file_name, key, value):
+        value = value if isinstance(value, dict) else {"count": value}
+        with self._write():
+            category = self._get_category(file_name, CATEGORY_DICT)
+            if category is None:
+                return
+            self._set_metric(
+                category, key, value.get("title", key), value.get("count", 0)
+            )
+
+    def inc_display_data(self, file_name, key, value, amount=1):
+        with self._write():
+            category = self._get_category(file_name, CATEGORY_DICT)
+            if category is None:
+                return
+            slot = self.metrics.get((category, key))
+            count = amount
+            if slot is not None:
+                count += METRIC.unpack_from(self.mm, slot)[3]
+            self._set_metric(category, key, value.get("title", key), count)
+
+    def add_account_to_display_data(self, file_name, session_name):
+        with self._write():
+            category = self._get_category(file_name, CATEGORY_ACCOUNTS)
+            if category is None:
+                return
+
+            slot = self.accounts.get(session_name)
+            if slot is None:
+                slot = self._find_free_account()
+                if slot is None:
+                    return
+                self.accounts[session_name] = slot
+                flags = 0
+            else:
+                flags = ACCOUNT.unpack_from(self.mm, slot)[1]
+            ACCOUNT.pack_into(
+                self.mm, slot, _encode(session_name, 64), flags | (1 << category)
+            )
+
+    def clear_display_data(self, file_name):
+        # A category the board never held stays with the JSON/DB storage.
+        with self._write():
+            category = self.categories.get(_get_category_name(file_name))
+            if category is None:
+                return
+
+            for metric_key, slot in list(self.metrics.items()):
+                if metric_key[0] == category:
+                    METRIC.pack_into(self.mm, slot, FREE_SLOT, b"", b"", 0)
+                    del self.metrics[metric_key]
+
+            for session_name, slot in list(self.accounts.items()):
+                flags = ACCOUNT.unpack_from(self.mm, slot)[1] & ~(1 << category)
+                if flags:
+                    ACCOUNT.pack_into(self.mm, slot, _encode(session_name, 64), flags)
+                else:
+                    ACCOUNT.pack_into(self.mm, slot, b"", 0)
+                    del self.accounts[session_name]
+
+    def _write(self):
+        return _BoardWrite(self)
+
+    def _get_category(self, file_name, category_type):
+        name = _get_category_name(file_name)
+        index = self.categories.get(name)
+        if index is None:
+            if len(self.categories) >= MAX_CATEGORIES:
+                return None
+            index = len(self.categories)
+            self.categories[name] = index
+        CATEGORY.pack_into(
+            self.mm,
+            CATEGORIES_OFFSET + index * CATEGORY.size,
+            _encode(name, 48),
+            category_type,
+        )
+        return index
+
+    def _set_metric(self, category, key, title, count):
+        slot = self.metrics.get((category, key))
+        if slot is None:
+            slot = self._find_free_metric()
+            if slot is None:
+                return
+            self.metrics[(category, key)] = slot
+
+        try:
+            count = int(count)
+        except (TypeError, ValueError):
+            count = 0
+        METRIC.pack_into(
+            self.mm, slot, category, _encode(key, 48), _encode(title, 96), count
+        )
+
+    def _find_free_metric(self):
+        used = set(self.metrics.values())
+        for index in range(MAX_METRICS):
+            slot = METRICS_OFFSET + index * METRIC.size
+            if slot not in used:
+                return slot
+        return None
+
+    def _find_free_account(self):
+        used = set(self.accounts.values())
+        for index in range(MAX_ACCOUNTS):
+            slot = ACCOUNTS_OFFSET + index * ACCOUNT.size
+            if slot not in used:
+                return slot
+        return None
+
+
+class _BoardWrite:
+    # Seqlock: the sequence is odd while a write is in progress, readers retry.
+    def __init__(self, board):
+        self.board = board
+
+    def __enter__(self):
+        self.board.lock.acquire()
+        sequence = SEQUENCE.unpack_from(self.board.mm, SEQUENCE_OFFSET)[0]
+        # An odd sequence means a previous writer was killed mid write.
+        SEQUENCE.pack_into(self.board.mm, SEQUENCE_OFFSET, (sequence | 1) + 2)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        mm = self.board.mm
+        struct.pack_into("<d", mm, SEQUENCE_OFFSET + SEQUENCE.size, time.time())
+        sequence = SEQUENCE.unpack_from(mm, SEQUENCE_OFFSET)[0]
+        SEQUENCE.pack_into(mm, SEQUENCE_OFFSET, sequence + 1)
+        self.board.lock.release()
+        return False
+
+
+readers_lock = threading.Lock()
+readers = {}
+
+
+def _get_reader(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    if stat.st_size != BOARD_SIZE:
+        return None
+
+    with readers_lock:
+        reader = readers.get(path)
+        if reader is not None and reader[0] == stat.st_ino:
+            return reader[1]
+
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), BOARD_SIZE, access=mmap.ACCESS_READ)
+        if reader is not None:
+            reader[1].close()
+        readers[path] = (stat.st_ino, mm)
+        return mm
+
+
+def read_snapshot(module_dir):
+    mm = _get_reader(os.path.join(module_dir, BOARD_FILE))
+    if mm is None:
+        return None
+
+    for _ in range(READ_RETRIES):
+        sequence = SEQUENCE.unpack_from(mm, SEQUENCE_OFFSET)[0]
+        if sequence & 1:
+            time.sleep(0)
+            continue
+
+        data = mm[:BOARD_SIZE]
+        if SEQUENCE.unpack_from(mm, SEQUENCE_OFFSET)[0] == sequence:
+            return _parse(data)
+    return None
+
+
+def _parse(data):
+    magic, version, _, updated = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        return None
+
+    categories = {}
+    for index in range(MAX_CATEGORIES):
+        name, category_type = CATEGORY.unpack_from(
+            data, CATEGORIES_OFFSET + index * CATEGORY.size
+        )
+        if not name.strip(b"\x00"):
+            break
+        categories[index] = (_decode(name), category_type, {})
+
+    for category, key, title, count in METRIC.iter_unpack(
+        data[METRICS_OFFSET:ACCOUNTS_OFFSET]
+    ):
+        if category in categories and categories[category][1] == CATEGORY_DICT:
+            categories[category][2][_decode(key)] = {
+                "title": _decode(title),
+                "count": count,
+            }
+
+    # Account categories are keyed by session name, like the JSON files.
+    for session_name, flags in ACCOUNT.iter_unpack(data[ACCOUNTS_OFFSET:]):
+        if not flags:
+            continue
+        for category, (_, category_type, values) in categories.items():
+            if flags & (1 << category) and category_type == CATEGORY_ACCOUNTS:
+                values[_decode(session_name)] = True
+
+    return {
+        "updated": updated,
+        "categories": {name: values for name, _, values in categories.values()},
+    }
+
+
+def read(module_dir, category):
+    snapshot = read_snapshot(module_dir)
+    if snapshot is None:
+        return None
+    return snapshot["categories"].get(_get_category_name(category))
@@ -7,7 +7,6 @@ import importlib
 import random
 import sys
 import os
-import json
 import asyncio
 from pathlib import Path
 import threading
@@ -16,19 +15,14 @@ import time
 
 import utilities.utilities as utilities
 from FarmBot.FarmBot import FarmBot
-from mcf_utils.api import API
+from mcf_utils.api import AsyncAPI
+from mcf_utils.module_availability import ModuleAvailability
 
 # Constants
 CHECK_INTERVAL = utilities.getConfig("check_interval", 3600)
 MASTER_CRYPTO_FARM_BOT_DIR = Path(__file__).resolve().parents[2]
 MODULE_DIR = Path(__file__).resolve().parent
 
-PYROGRAM_ACCOUNTS_FILE = os.path.join(
-    MASTER_CRYPTO_FARM_BOT_DIR, "telegram_accounts/accounts.json"
-)
-MODULE_ACCOUNTS_FILE = os.path.join(MODULE_DIR, "accounts.json")
-MODULE_DISABLED_SESSIONS_FILE = os.path.join(MODULE_DIR, "disabled_sessions.json")
-
 CONFIG_ERROR_MSG = (
     "\033[31mEste módulo foi projetado para MasterCryptoFarmBot.\033[0m\n"
     "\033[31mVocê não pode executar este módulo como aplicação standalone.\033[0m\n"
@@ -60,22 +54,38 @@ try:
 
     from mcf_utils.database import Database
     from mcf_utils import utils
-    from mcf_utils.api import API as MCF_API
+    from mcf_utils import module_shutdown
+    from mcf_utils import module_ipc
+    from mcf_utils.module_config import ModuleConfig
+    from mcf_utils.status_board import StatusBoard
+
+    status_board = StatusBoard(MODULE_DIR)
+    module_config = ModuleConfig(MODULE_DIR, MASTER_CRYPTO_FARM_BOT_DIR)
 except Exception as e:
     print(CONFIG_ERROR_MSG)
     print(f"Erro: {e}")
     exit(1)
 
 async def check_cd(log, bot_globals):
-    sleep_time = CHECK_INTERVAL
-    if not module_available(log, bot_globals["license"], bot_globals["module_name"]):
+    sleep_time = module_config.get("check_interval", CHECK_INTERVAL)
+    if not await bot_globals["module_availability"].is_available():
         sleep_time = 600
 
     log.info(f"<y>💤 Verificando novamente em </y><c>{sleep_time}</c><y> segundos ...</y>")
-    time.sleep(sleep_time)
+    if await wait_or_run_now(sleep_time):
+        return
     random_wait = random.randint(60, 120)
     log.info(f"<y>💤 Aguardando aleatoriamente por </y><c>{random_wait}</c><y> segundos ...</y>")
-    await asyncio.sleep(random_wait)
+    await wait_or_run_now(random_wait)
+
+async def wait_or_run_now(seconds):
+    end_time = time.time() + seconds
+    while time.time() < end_time:
+        if run_now_event.is_set():
+            run_now_event.clear()
+            return True
+        await asyncio.sleep(min(1, end_time - time.time()))
+    return False
 
 # Edit the following variables
 BOT_ID = "DropeeBot"
@@ -85,63 +95,7 @@ APP_URL = "https://dropee.clicker-game-api.tropee.com"
 VERSION_HASH = "v1.0.0"
 # End of variables to edit
 
-recent_checks = {}
-
-def module_available(logger, license, module_name):
-    if not license or not module_name:
-        return False
-
-    if not VERSION_HASH or VERSION_HASH == "":
-        return True
-
-    if (
-        "status" in recent_checks
-        and recent_checks["status"]
-        and "date" in recent_checks
-    ):
-        if time.time() - recent_checks["date"] < 600:
-            return recent_checks["status"]
-    recent_checks["date"] = time.time()
-    recent_checks["status"] = False
-
-    apiObj = API(logger)
-    data = {
-        "action": "version_check",
-        "module_name": module_name,
-        "version": VERSION_HASH,
-    }
-
-    response = apiObj.get_task_answer(license, data)
-    if "error" in response:
-        logger.error(f"<y>⭕ Erro da API: {response['error']}</y>")
-    elif "status" in response and response["status"] == "success":
-        recent_checks["status"] = True
-    elif (
-        "status" in response and response["status"] == "error" and "message" in response
-    ):
-        logger.info(f"<y>🟡 {response['message']}</y>")
-    else:
-        logger.error(
-            f"<y>🟡 Não foi possível verificar a versão do módulo, tente novamente mais tarde</y>"
-        )
-
-    return recent_checks["status"]
-
-def load_json_file(file_path, default=None):
-    try:
-        if not os.path.exists(file_path):
-            return default
-
-        with open(file_path, "r", encoding="utf-8") as f:
-            json_result = json.load(f)
-            if not json_result or len(json_result) == 0:
-                return default
-            return json_result
-
-    except Exception as e:
-        pass
-
-    return default
+run_now_event = threading.Event()
 
 async def process_pg_account(account, bot_globals, log, group_id=None):
     try:
@@ -171,12 +125,12 @@ async def process_pg_account(account, bot_globals, log, group_id=None):
 
         web_app_data = await tg.run()
         if not web_app_data:
-            utilities.inc_display_data(
+            status_board.inc_display_data(
                 "display_data.json",
                 "telegram_issues",
                 {"title": "Problemas com Telegram", "name": "count"},
             )
-            utilities.add_account_to_display_data(
+            status_board.add_account_to_display_data(
                 "display_data_telegram_issues.json", account["session_name"]
             )
             log.error(
@@ -186,10 +140,10 @@ async def process_pg_account(account, bot_globals, log, group_id=None):
 
         web_app_query = utils.extract_tg_query_from_url(web_app_data)
         if not web_app_query:
-            utilities.add_account_to_display_data(
+            status_board.add_account_to_display_data(
                 "display_data_telegram_issues.json", account["session_name"]
             )
-            utilities.inc_display_data(
+            status_board.inc_display_data(
                 "display_data.json",
                 "telegram_issues",
                 {"title": "Problemas com Telegram", "name": "count"},
@@ -284,10 +238,19 @@ async def handle_accounts(group_id, accounts, bot_globals, log):
         )
 
         for account in accounts:
-            try:
-                module_status = module_available(
-                    log, bot_globals["license"], bot_globals["module_name"]
+            if module_shutdown.is_shutting_down():
+                return
+
+            # Settings and account changes apply between two accounts.
+            module_config.refresh()
+            if module_config.is_account_disabled(account):
+                log.info(
+                    f"<y>🔒 Conta <c>{account['session_name']}</c> foi desabilitada, pulando ...</y>"
                 )
+                continue
+
+            try:
+                module_status = await bot_globals["module_availability"].is_available()
                 if not module_status:
                     log.error(
                         f"<r>❌ Módulo <c>{bot_globals['module_name']}</c> API foi alterada. Aguarde uma atualização.</r>"
@@ -316,14 +279,14 @@ def load_accounts():
     pyrogram_accounts_count = 0
     module_accounts_count = 0
     all_accounts = []
-    disabled_accounts = load_json_file(MODULE_DISABLED_SESSIONS_FILE, [])
+    disabled_accounts = module_config.get_disabled_sessions()
 
     try:
-        pyrogram_accounts = load_json_file(PYROGRAM_ACCOUNTS_FILE, None)
-        if pyrogram_accounts is not None:
+        pyrogram_accounts = module_config.get_telegram_accounts()
+        if pyrogram_accounts:
             for account in pyrogram_accounts:
                 if account.get("disabled", False):
-                    utilities.inc_display_data(
+                    status_board.inc_display_data(
                         "display_data.json",
                         "disabled_accounts",
                         {"title": "Contas Desabilitadas", "name": "count"},
@@ -331,7 +294,7 @@ def load_accounts():
                     continue
 
                 if account["session_name"] in disabled_accounts:
-                    utilities.inc_display_data(
+                    status_board.inc_display_data(
                         "display_data.json",
                         "disabled_accounts",
                         {"title": "Contas Desabilitadas", "name": "count"},
@@ -342,11 +305,11 @@ def load_accounts():
                 account["is_pyrogram"] = True
                 all_accounts.append(account)
 
-        module_accounts = load_json_file(MODULE_ACCOUNTS_FILE, None)
-        if module_accounts is not None:
+        module_accounts = module_config.get_accounts()
+        if module_accounts:
             for account in module_accounts:
                 if account.get("disabled", False):
-                    utilities.inc_display_data(
+                    status_board.inc_display_data(
                         "display_data.json",
                         "disabled_accounts",
                         {"title": "Contas Desabilitadas", "name": "count"},
@@ -381,9 +344,24 @@ async def main():
     module_dir = Path(__file__).resolve().parent
     module_name = module_dir.name
     log = lc.getLogger(str(module_dir / "bot.log"), module_name)
+    module_config.log = log
 
     mcf_pid = None
-    if len(sys.argv) > 1:
+    ipc = module_ipc.connect(log)
+    if ipc is not None:
+        ipc.on("run_now", lambda message: run_now_event.set())
+        ipc.on(
+            "set_account_disabled",
+            lambda message: module_config.set_account_disabled(
+                message.get("session_name"), message.get("disabled")
+            ),
+        )
+        ipc.on(
+            "reload_settings",
+            lambda message: module_config.set_settings(message.get("settings")),
+        )
+        ipc.start(on_disconnect=module_shutdown.request_shutdown)
+    elif len(sys.argv) > 1:
         mcf_pid = sys.argv[1]
         threading.Thread(
             target=utilities.check_mcf_status, args=(log, mcf_pid, module_name)
@@ -412,8 +390,11 @@ async def main():
 
     bot_globals["license"] = license_key
     bot_globals["config"] = cfg.config
-    apiObj = MCF_API(log)
-    modules = apiObj.get_user_modules(license_key)
+    bot_globals["module_availability"] = ModuleAvailability(
+        log, license_key, module_name, VERSION_HASH
+    )
+    apiObj = AsyncAPI(log)
+    modules = await apiObj.get_user_modules(license_key)
 
     if modules is None or "error" in modules:
         log.error(f"<r>❌ Não foi possível obter módulos: {modules['error']}</r>")
@@ -442,11 +423,13 @@ async def main():
         try:
             log.info("<g>🔍 Verificando contas ...</g>")
 
-            utilities.clear_display_data("display_data.json")
-            utilities.clear_display_data("display_data_telegram_issues.json")
+            status_board.clear_display_data("display_data.json")
+            status_board.clear_display_data("display_data_telegram_issues.json")
+            # Written by FarmBot through utilities, the board can not hold them.
             utilities.clear_display_data("display_data_bot_issues.json")
             utilities.clear_display_data("display_data_success_accounts.json")
 
+            module_config.refresh()
             pyrogram_accounts, module_accounts, all_accounts = load_accounts()
             if all_accounts is None or len(all_accounts) == 0:
                 log.info("<y>🟠 Nenhuma conta encontrada!</y>")
@@ -457,25 +440,25 @@ async def main():
                 f"<g>👥 Encontradas <c>{len(all_accounts)}</c> contas: <c>{pyrogram_accounts}</c> contas Pyrogram/Telethon, <c>{module_accounts}</c> contas do módulo.</g>"
             )
 
-            utilities.update_display_data(
+            status_board.update_display_data(
                 "display_data.json",
                 "active_accounts",
                 {"title": "Contas Ativas", "count": len(all_accounts)},
             )
 
-            utilities.update_display_data(
+            status_board.update_display_data(
                 "display_data.json",
                 "pyrogram_accounts",
                 {"title": "Contas Pyrogram/Telethon", "count": pyrogram_accounts},
             )
 
-            utilities.update_display_data(
+            status_board.update_display_data(
                 "display_data.json",
                 "module_accounts",
                 {"title": "Contas do Módulo", "count": module_accounts},
             )
 
-            utilities.update_display_data(
+            status_board.update_display_data(
                 "display_data.json",
                 "success_accounts",
                 {"title": "Contas com farm finalizado com sucesso", "count": 0},
@@ -492,13 +475,13 @@ async def main():
 
             grouped_accounts = group_by_proxy(all_accounts)
 
-            utilities.update_display_data(
+            status_board.update_display_data(
                 "display_data.json",
                 "proxy_groups",
                 {"title": "Grupos de Proxy", "count": len(grouped_accounts)},
             )
 
-            utilities.update_display_data(
+            status_board.update_display_data(
                 "display_data.json",
                 "telegram_issues",
                 {"title": "Problemas com Telegram", "count": 0},
@@ -543,7 +526,7 @@ async def main():
 
             tasks = []
             max_threads = min(
-                utilities.getConfig("max_threads", 5), len(grouped_accounts)
+                module_config.get("max_threads", 5), len(grouped_accounts)
             )
             log.info(
                 f"<g>🚀 Iniciando processamento de contas com máximo de <c>{max_threads}</c> threads ...</g>"
@@ -568,7 +551,7 @@ async def main():
 
                 try:
                     task = threading.Thread(
-                        target=lambda: asyncio.run(
+                        target=lambda: module_shutdown.run(
                             handle_accounts(group_id, accounts, bot_globals, log)
                         )
                     )
@@ -603,7 +586,9 @@ if __name__ == "__main__":
     try:
         if sys.platform == "win32":
             asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
-        asyncio.run(main())
+        module_shutdown.install()
+        module_shutdown.run(main())
+        module_shutdown.wait(utils.getConfig(cfg.config, "module_stop_grace_period", 10))
     except KeyboardInterrupt:
         print(f"{lc.r}🛑 Módulo do Bot interrompido pelo usuário ... {lc.rs}")
     except Exception as e:
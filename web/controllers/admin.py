@@ -12,6 +12,8 @@ import signal
 from flask import redirect, render_template, session
 
 from mcf_utils.database import Database
+from mcf_utils.module_storage import ModuleStorage
+from mcf_utils.db_metrics import db_metrics
 import mcf_utils.variables as vr
 import mcf_utils.Git as Git
 import mcf_utils.logColors as lc
@@ -403,7 +405,7 @@ class admin:
                                 )
                                 module["installed"] = True
                                 module["owned"] = True
-                                db.updateSettings(f"{module['name']}_disabled", True)
+                                db.setModuleDisabled(module["name"], True)
                             else:
                                 error = response.get(
                                     "error",
@@ -430,10 +432,11 @@ class admin:
 
         bot = requests.args.get("bot_id")
 
-        bots = self._bots_load_all(webServer)
-        for b in bots:
-            if b["id"] == bot:
-                logs = b["logs"]
+        for module in os.listdir("modules"):
+            if hashlib.md5(module.encode()).hexdigest() == bot and os.path.exists(
+                f"modules/{module}/bot.py"
+            ):
+                logs = self._bots_load_logs(module, webServer)
                 break
 
         return {"status": "success", "logs": logs}
@@ -457,14 +460,9 @@ class admin:
         if module_name is None:
             return {}
 
-        module_dir = os.path.join(os.getcwd(), f"modules/{module_name}")
-        display_data = {}
-        display_data_file = os.path.join(module_dir, "display_data.json")
-        if os.path.exists(display_data_file):
-            with open(display_data_file, "r") as f:
-                display_data = json.load(f)
-
-        return display_data
+        return ModuleStorage("database.db", webServer.logger).get_display_data(
+            module_name, "display_data"
+        )
 
     def bot_issues_accounts(self, requests, webServer):
         if "admin" not in session:
@@ -486,14 +484,9 @@ class admin:
         if module_name is None:
             return {}
 
-        module_dir = os.path.join(os.getcwd(), f"modules/{module_name}")
-        display_data = {}
-        display_data_file = os.path.join(module_dir, "display_data_bot_issues.json")
-        if os.path.exists(display_data_file):
-            with open(display_data_file, "r") as f:
-                display_data = json.load(f)
-
-        return display_data
+        return ModuleStorage("database.db", webServer.logger).get_display_data(
+            module_name, "display_data_bot_issues"
+        )
 
     def telegram_issues_accounts(self, requests, webServer):
         if "admin" not in session:
@@ -515,16 +508,9 @@ class admin:
         if module_name is None:
             return {}
 
-        module_dir = os.path.join(os.getcwd(), f"modules/{module_name}")
-        display_data = {}
-        display_data_file = os.path.join(
-            module_dir, "display_data_telegram_issues.json"
+        return ModuleStorage("database.db", webServer.logger).get_display_data(
+            module_name, "display_data_telegram_issues"
         )
-        if os.path.exists(display_data_file):
-            with open(display_data_file, "r") as f:
-                display_data = json.load(f)
-
-        return display_data
 
     def successful_accounts(self, requests, webServer):
         if "admin" not in session:
@@ -546,16 +532,45 @@ class admin:
         if module_name is None:
             return {}
 
-        module_dir = os.path.join(os.getcwd(), f"modules/{module_name}")
-        display_data = {}
-        display_data_file = os.path.join(
-            module_dir, "display_data_success_accounts.json"
+        return ModuleStorage("database.db", webServer.logger).get_display_data(
+            module_name, "display_data_success_accounts"
         )
-        if os.path.exists(display_data_file):
-            with open(display_data_file, "r") as f:
-                display_data = json.load(f)
 
-        return display_data
+    def bot_resources(self, requests, webServer):
+        if "admin" not in session:
+            return redirect("/auth/login.py")
+
+        if requests.method != "POST":
+            return redirect("/admin/bots.py")
+
+        telemetry = webServer.module_threads.telemetry
+        latest = telemetry.get_latest()
+        if "bot_id" not in requests.args:
+            return {"status": "success", "resources": latest}
+
+        bot = requests.args.get("bot_id")
+        for module in latest:
+            if hashlib.md5(module.encode()).hexdigest() == bot:
+                return {
+                    "status": "success",
+                    "name": module,
+                    "resources": telemetry.get_samples(module),
+                    "ipc": webServer.module_threads.get_module_ipc_status(module),
+                }
+
+        return {}
+
+    def db_metrics(self, requests, webServer):
+        if "admin" not in session:
+            return redirect("/auth/login.py")
+
+        if requests.method != "POST":
+            return redirect("/admin/bots.py")
+
+        if "reset" in requests.args:
+            db_metrics.reset()
+
+        return db_metrics.snapshot()
 
     def module_accounts(self, requests, webServer):
         if "admin" not in session:
@@ -655,6 +670,8 @@ class admin:
             success = self._bots_start_bot(requests, bots, webServer)
         elif "restart_bot" in requests.args:
             success = self._bots_restart_bot(requests, bots, webServer)
+        elif "run_now" in requests.args:
+            success = self._bots_run_now(requests, bots, webServer)
         elif "update_bot" in requests.args:
             success = self._update_bot(requests, webServer)
 
@@ -715,8 +732,9 @@ class admin:
             if str(bot["id"]) == str(BotID):
                 disabled_sessions = requests.form.getlist("disabled_sessions")
                 bot["disabled_sessions"] = disabled_sessions
-                with open(f"modules/{bot['name']}/disabled_sessions.json", "w") as f:
-                    json.dump(disabled_sessions, f, indent=4)
+                ModuleStorage("database.db", webServer.logger).set_disabled_sessions(
+                    bot["name"], disabled_sessions
+                )
                 webServer.logger.info(
                     f"🔒 <yellow>Module disabled sessions updated</yellow>, Bot Name: <cyan>{bot['name']}</cyan>"
                 )
@@ -727,8 +745,10 @@ class admin:
         modules = os.listdir("modules")
         bots = []
         db = Database("database.db", webServer.logger)
+        settings = db.getSettingsMany(["license"])
+        module_states = db.getModuleStates()
         user_modules = api.API(webServer.logger).get_user_modules(
-            db.getSettings("license", "Free License")
+            settings.get("license") or "Free License"
         )
 
         if user_modules is None or "error" in user_modules:
@@ -740,34 +760,36 @@ class admin:
             if os.path.isdir(f"modules/{module}") and os.path.exists(
                 f"modules/{module}/bot.py"
             ):
-                bot = self._bots_load_single(module, db, webServer)
+                bot = self._bots_load_single(module, db, webServer, module_states)
                 bots.append(bot)
         return bots
 
-    def _bots_load_single(self, module, db, webServer):
+    def _bots_load_single(self, module, db, webServer, module_states=None):
         bot = {"name": module, "id": hashlib.md5(module.encode()).hexdigest()}
         bot["logo"] = self._bots_load_logo(module)
-        bot["disabled"] = db.getSettings(f"{module}_disabled", False)
-        bot["logs"] = self._bots_load_logs(module)
-        bot["settings"] = self._bots_load_json(
-            f"modules/{module}/bot_settings.json", {}
-        )
+        if module_states is not None:
+            bot["state"] = module_states.get(module, {})
+        else:
+            bot["state"] = db.getModuleState(module)
+        bot["disabled"] = bot["state"].get("disabled", False) is True
+        bot["logs"] = self._bots_load_logs(module, webServer)
+        storage = ModuleStorage("database.db", webServer.logger)
+        bot["settings"] = storage.get_settings(module)
         bot["settings_types"] = self._bots_load_json(
             f"modules/{module}/bot_settings_types.json", None
         )
-        bot["disabled_sessions"] = self._bots_load_json(
-            f"modules/{module}/disabled_sessions.json", []
-        )
+        bot["disabled_sessions"] = storage.get_disabled_sessions(module)
         bot["disable_accounts_file"] = self._bots_file_exists(
             f"modules/{module}/.disabled_module_accounts"
         )
 
-        bot["accounts"] = self._bots_load_json(f"modules/{module}/accounts.json", [])
+        bot["accounts"] = storage.get_accounts(module)
         bot["settings_inputs"] = self._bots_prepare_settings_inputs(bot)
         bot["is_running"] = webServer.module_threads.is_module_running(module)
         bot["uptime"] = utils.TimeAgo(
             webServer.module_threads.get_module_start_time(module)
         )
+        bot["ipc"] = webServer.module_threads.get_module_ipc_status(module)
 
         bot["commit_hash"] = ""
         bot["commit_date"] = ""
@@ -802,16 +824,22 @@ class admin:
             return f"data:image/png;base64,{logo_data}"
         return ""
 
-    def _bots_load_logs(self, module):
-        log_path = f"modules/{module}/bot.log"
-        if os.path.exists(log_path):
+    def _bots_load_logs(self, module, webServer):
+        lines = webServer.module_threads.module_output.get_lines(module, 100)
+        if not lines:
+            log_path = f"modules/{module}/bot.log"
+            if not os.path.exists(log_path):
+                return "No logs available."
+
             with open(log_path, "r", encoding="utf-8") as f:
-                lines = f.readlines()
-            logs = "".join(lines[-100:])
-            logs = utils.ansi_to_html(logs)
-            logs = re.sub(r"\[MasterCryptoFarmBot\] ", "", logs)
-            return logs
-        return "No logs available."
+                lines = f.readlines()[-100:]
+
+        logs = "".join(lines)
+        logs = re.sub(
+            r"(\x1b\[[0-9;]*m)*\[MasterCryptoFarmBot\](\x1b\[[0-9;]*m)* ", "", logs
+        )
+        logs = utils.ansi_to_html(logs)
+        return logs
 
     def _bots_load_json(self, path, default):
         if os.path.exists(path):
@@ -870,7 +898,7 @@ class admin:
         for bot in bots:
             if str(bot["id"]) == str(BotID):
                 db = Database("database.db", webServer.logger)
-                db.updateSettings(f"{bot['name']}_disabled", True)
+                db.setModuleDisabled(bot["name"], True)
                 bot["disabled"] = True
                 webServer.logger.info(
                     f"<red>🔒 Bot disabled, Bot Name: <cyan>{bot['name']}</cyan></red>"
@@ -884,7 +912,7 @@ class admin:
         for bot in bots:
             if str(bot["id"]) == str(BotID):
                 db = Database("database.db", webServer.logger)
-                db.deleteSettings(f"{bot['name']}_disabled")
+                db.setModuleDisabled(bot["name"], False)
                 bot["disabled"] = False
                 webServer.logger.info(
                     f"<green>🔓 Bot enabled, Bot Name: <cyan>{bot['name']}</cyan></green>"
@@ -903,7 +931,9 @@ class admin:
                 for account in accounts:
                     if str(account["id"]) == str(AccountID):
                         accounts.remove(account)
-                        self._bots_save_accounts(bot["name"], accounts)
+                        ModuleStorage("database.db", webServer.logger).delete_account(
+                            bot["name"], account["session_name"]
+                        )
                         bot["accounts"] = accounts
                         webServer.logger.info(
                             f"<red>🗑 Account deleted, Bot Name: <cyan>{bot['name']}</cyan>, Session Name: <cyan>{account['display_name']}</cyan></red>"
@@ -922,7 +952,17 @@ class admin:
                 for account in accounts:
                     if str(account["id"]) == str(AccountID):
                         account["disabled"] = True
-                        self._bots_save_accounts(bot["name"], accounts)
+                        ModuleStorage(
+                            "database.db", webServer.logger
+                        ).set_account_disabled(
+                            bot["name"], account["session_name"], True
+                        )
+                        webServer.module_threads.send_module_command(
+                            bot["name"],
+                            "set_account_disabled",
+                            session_name=account["session_name"],
+                            disabled=True,
+                        )
                         bot["accounts"] = accounts
                         webServer.logger.info(
                             f"<red>🔒 Account disabled, Bot Name: <cyan>{bot['name']}</cyan>, Session Name: <cyan>{account['display_name']}</cyan></red>"
@@ -941,7 +981,17 @@ class admin:
                 for account in accounts:
                     if str(account["id"]) == str(AccountID):
                         account["disabled"] = False
-                        self._bots_save_accounts(bot["name"], accounts)
+                        ModuleStorage(
+                            "database.db", webServer.logger
+                        ).set_account_disabled(
+                            bot["name"], account["session_name"], False
+                        )
+                        webServer.module_threads.send_module_command(
+                            bot["name"],
+                            "set_account_disabled",
+                            session_name=account["session_name"],
+                            disabled=False,
+                        )
                         bot["accounts"] = accounts
                         webServer.logger.info(
                             f"<green>🔓 Account enabled, Bot Name: <cyan>{bot['name']}</cyan>, Session Name: <cyan>{account['display_name']}</cyan></green>"
@@ -984,9 +1034,19 @@ class admin:
                 return f"Bot {bot['name']} restarted successfully."
         return None
 
-    def _bots_save_accounts(self, bot_name, accounts):
-        with open(f"modules/{bot_name}/accounts.json", "w") as f:
-            json.dump(accounts, f, indent=4)
+    def _bots_run_now(self, requests, bots, webServer):
+        BotID = requests.args.get("run_now", 0)
+        for bot in bots:
+            if str(bot["id"]) == str(BotID):
+                if not webServer.module_threads.send_module_command(
+                    bot["name"], "run_now"
+                ):
+                    return None
+                webServer.logger.info(
+                    f"<green>⏩ Bot module asked to run now, Bot Module Name: <cyan>{bot['name']}</cyan></green>"
+                )
+                return f"Bot {bot['name']} will run now."
+        return None
 
     def _bots_update_settings(self, requests, bots, webServer):
         BotID = requests.form["bot_id"]
@@ -1003,13 +1063,19 @@ class admin:
                         requests, key, settings_inputs[key]
                     )
 
-                self._bots_save_settings(bot["name"], settings)
+                ModuleStorage("database.db", webServer.logger).update_settings(
+                    bot["name"], settings
+                )
                 bot["settings"] = settings
                 webServer.logger.info(
                     f"<green>🔄 Bot settings updated, Bot Name: <cyan>{bot['name']}</cyan></green>"
                 )
 
-                webServer.module_threads.restart_module(bot["name"])
+                # Modules that can reload their settings keep running.
+                if not webServer.module_threads.send_module_command(
+                    bot["name"], "reload_settings", settings=settings
+                ):
+                    webServer.module_threads.restart_module(bot["name"])
                 return f"Settings updated successfully.", None
         return None, "Bot not found."
 
@@ -1049,10 +1115,6 @@ class admin:
             )
         return requests.form[key]
 
-    def _bots_save_settings(self, bot_name, settings):
-        with open(f"modules/{bot_name}/bot_settings.json", "w") as f:
-            json.dump(settings, f, indent=4)
-
     def _bots_add_account(self, requests, bots, webServer):
         BotID = requests.form["add_account"]
         for bot in bots:
@@ -1101,7 +1163,9 @@ class admin:
                     )
 
                 bot["accounts"].append(account)
-                self._bots_save_accounts(bot["name"], bot["accounts"])
+                ModuleStorage("database.db", webServer.logger).save_account(
+                    bot["name"], account
+                )
                 webServer.logger.info(
                     f"<green>➕ Account added, Bot Name: <cyan>{bot['name']}</cyan>, Session Name: <cyan>{account['display_name']}</cyan></green>"
                 )
@@ -1136,7 +1200,9 @@ class admin:
                                 f"<green>└─ ✅ Proxy tested successfully, IP: </green><cyan>{utils.HideIP(proxyTestResponse)}</cyan>"
                             )
 
-                        self._bots_save_accounts(bot["name"], bot["accounts"])
+                        ModuleStorage("database.db", webServer.logger).save_account(
+                            bot["name"], account
+                        )
                         webServer.logger.info(
                             f"<green>🔄 Account updated, Bot Name: <cyan>{bot['name']}</cyan>, Session Name: <cyan>{account['display_name']}</cyan></green>"
                         )